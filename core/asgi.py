@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Load CV models in the background (MODEL_WARMUP) so worker boot stays fast
+from stream.registry import warm_up_from_settings
+warm_up_from_settings()
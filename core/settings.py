@@ -107,4 +107,42 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # Camera settings
-CAMERA_INDEX = 0  # Default camera index
\ No newline at end of file
+CAMERA_INDEX = 0  # Default camera index
+ANNOTATE_FRAMES = True  # Draw detection overlays on streamed frames
+TRACKER_TTL_SECONDS = 30  # Forget tracks (and their last emotion) not seen for this long
+
+# When set, /video_feed/ relays frames from `manage.py run_camera_worker`
+# over this Unix socket instead of opening the camera in the web process
+CAMERA_WORKER_SOCKET = None  # e.g. '/tmp/camera_worker.sock'
+
+# Models loaded on a background thread at WSGI/ASGI worker boot (see
+# stream/registry.py); leave empty on API-only workers so they never load CV
+MODEL_WARMUP = []  # e.g. ['face_cascade', 'face_recognition']
+
+# Binary ingest settings: when set, detectors stream detections to
+# `manage.py run_ingest_server` instead of POSTing to /api/emotion-detect/
+EMOTION_INGEST_ADDRESS = None  # e.g. 'tcp://127.0.0.1:9100' or 'unix:///tmp/emotion_ingest.sock'
+
+# Detection spool: when set, detectors append to this directory and
+# `manage.py forward_spool` replays it into the database or ingest server
+EMOTION_SPOOL_DIR = None  # e.g. BASE_DIR / 'spool'
+
+# Event-triggered clip recording
+CLIP_RECORDING_ENABLED = False
+CLIP_DIR = BASE_DIR / 'clips'
+CLIP_PRE_ROLL_SECONDS = 5
+CLIP_POST_ROLL_SECONDS = 5
+CLIP_TRIGGER_EMOTIONS = ['angry', 'fear']
+CLIP_TRIGGER_NEW_PERSON = True
+
+# Face re-identification (requires face-recognition/dlib)
+FACE_REID_ENABLED = False
+FACE_REID_SNAPSHOT = BASE_DIR / 'face_index.npz'
+FACE_REID_THRESHOLD = 0.6  # Max euclidean distance between face encodings
+
+# Motion gate: skip face/emotion detection on static scenes
+MOTION_GATE_ENABLED = False
+MOTION_THRESHOLD = 0.002  # Fraction of pixels that must change
+MOTION_KEYFRAME_SECONDS = 5.0  # Re-run detection at least this often
+MOTION_IDLE_FPS = 5  # Stream frame rate while the scene is static
+MOTION_TRACKING_GRACE_SECONDS = 2.0  # Keep detecting tracked faces this long after motion stops
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Load CV models in the background (MODEL_WARMUP) so worker boot stays fast
+from stream.registry import warm_up_from_settings
+warm_up_from_settings()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Person, EmotionDetection, EmotionStats
+from .models import Person, EmotionDetection, EmotionStats, DetectionClip
 
 @admin.register(Person)
 class PersonAdmin(admin.ModelAdmin):
@@ -20,6 +20,17 @@ class EmotionDetectionAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('person')
 
+@admin.register(DetectionClip)
+class DetectionClipAdmin(admin.ModelAdmin):
+    list_display = ['person', 'trigger', 'emotion', 'camera_id', 'file_path', 'started_at']
+    list_filter = ['trigger', 'emotion', 'camera_id', 'started_at']
+    search_fields = ['person__person_id', 'file_path']
+    readonly_fields = ['detection', 'started_at', 'ended_at']
+    ordering = ['-started_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('person')
+
 @admin.register(EmotionStats)
 class EmotionStatsAdmin(admin.ModelAdmin):
     list_display = ['person', 'happy_count', 'sad_count', 'angry_count', 
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.6
+FONT_THICKNESS = 2
+LABEL_PAD = FONT_THICKNESS * 2 + 1  # Glyph strokes and antialiasing reach past getTextSize
+BOX_COLOR = (255, 0, 0)
+PERSON_COLOR = (255, 255, 255)
+EMOTION_COLOR = (0, 255, 0)
+
+
+class FrameAnnotator:
+    """Draw detection overlays on a copy of the frame
+
+    Text labels are rendered once into small bitmaps and cached (LRU), so
+    each frame only blits them instead of rasterizing text with putText.
+    Confidences are bucketed so labels stay cacheable.
+    """
+
+    def __init__(self, confidence_bucket=0.01, max_labels=2048):
+        self.confidence_bucket = confidence_bucket
+        self.max_labels = max_labels
+        self.labels = OrderedDict()
+
+    def annotate(self, frame, detections):
+        """Return an annotated copy of frame; the input is left untouched"""
+        output = frame.copy()
+        for detection in detections:
+            x, y, w, h = detection['box']
+            cv2.rectangle(output, (x, y), (x+w, y+h), BOX_COLOR, 2)
+
+            bucket = round(detection['confidence'] / self.confidence_bucket) * self.confidence_bucket
+            self._draw_label(output, detection['person_id'], PERSON_COLOR, x, y-10)
+            self._draw_label(output, f"{detection['emotion']} ({bucket:.2f})", EMOTION_COLOR, x, y+h+20)
+        return output
+
+    def label(self, text, color):
+        """Return a cached (bitmap, mask, text origin x, text origin y) for a text label"""
+        key = (text, color)
+        label = self.labels.get(key)
+        if label is not None:
+            self.labels.move_to_end(key)
+            return label
+
+        (width, height), baseline = cv2.getTextSize(text, FONT, FONT_SCALE, FONT_THICKNESS)
+        pad = LABEL_PAD
+        bitmap = np.zeros((height + baseline + 2 * pad, width + 2 * pad, 3), dtype=np.uint8)
+        cv2.putText(bitmap, text, (pad, height + pad), FONT, FONT_SCALE, color, FONT_THICKNESS)
+        mask = bitmap.any(axis=2)
+        label = self.labels[key] = (bitmap, mask, pad, height + pad)
+        if len(self.labels) > self.max_labels:
+            self.labels.popitem(last=False)
+        return label
+
+    def _draw_label(self, frame, text, color, x, y):
+        """Draw text with its baseline at (x, y), blitting the cached bitmap when it fits
+
+        Labels crossing the frame edge fall back to putText, whose clipping
+        of thick strokes differs from cropping the bitmap.
+        """
+        bitmap, mask, origin_x, origin_y = self.label(text, color)
+        top, left = y - origin_y, x - origin_x
+        frame_h, frame_w = frame.shape[:2]
+        if top < 0 or left < 0 or top + bitmap.shape[0] > frame_h or left + bitmap.shape[1] > frame_w:
+            cv2.putText(frame, text, (x, y), FONT, FONT_SCALE, color, FONT_THICKNESS)
+            return
+        region = frame[top:top + bitmap.shape[0], left:left + bitmap.shape[1]]
+        np.copyto(region, bitmap, where=mask[:, :, None])
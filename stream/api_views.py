@@ -1,7 +1,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import timedelta
@@ -10,8 +10,11 @@ from .serializers import (
     PersonSerializer, 
     EmotionDetectionSerializer, 
     EmotionDetectionCreateSerializer,
-    EmotionStatsSerializer
+    EmotionStatsSerializer,
+    EMOTION_DETECTION_VALUES,
+    serialize_detection_rows
 )
+from .renderers import fast_renderer_classes
 
 class EmotionDetectionCreateView(APIView):
     def post(self, request):
@@ -23,16 +26,25 @@ class EmotionDetectionCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class PersonListView(generics.ListAPIView):
-    queryset = Person.objects.all()
+    queryset = Person.objects.defer('face_embedding')
     serializer_class = PersonSerializer
 
 class PersonDetailView(generics.RetrieveAPIView):
-    queryset = Person.objects.all()
+    queryset = Person.objects.defer('face_embedding')
     serializer_class = PersonSerializer
     lookup_field = 'person_id'
 
 class EmotionHistoryView(generics.ListAPIView):
     serializer_class = EmotionDetectionSerializer
+    renderer_classes = fast_renderer_classes()
+    
+    def list(self, request, *args, **kwargs):
+        # Fetch plain rows with the person join instead of model instances
+        rows = self.get_queryset().values_list(*EMOTION_DETECTION_VALUES)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serialize_detection_rows(page))
+        return Response(serialize_detection_rows(rows))
     
     def get_queryset(self):
         person_id = self.kwargs.get('person_id')
@@ -131,12 +143,12 @@ def person_emotion_chart(request, person_id):
         )
 
 @api_view(['GET'])
+@renderer_classes(fast_renderer_classes())
 def live_emotions(request):
     """Get live emotion detections (last 30 seconds)"""
     thirty_seconds_ago = timezone.now() - timedelta(seconds=30)
     live_detections = EmotionDetection.objects.filter(
         detected_at__gte=thirty_seconds_ago
-    ).select_related('person').order_by('-detected_at')
+    ).order_by('-detected_at').values_list(*EMOTION_DETECTION_VALUES)
     
-    serializer = EmotionDetectionSerializer(live_detections, many=True)
-    return Response(serializer.data)
\ No newline at end of file
+    return Response(serialize_detection_rows(live_detections))
\ No newline at end of file
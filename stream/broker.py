@@ -0,0 +1,172 @@
+"""Local broker between the camera worker and web workers
+
+run_camera_worker publishes frames and detections on a Unix socket; web
+workers subscribe to it instead of opening the camera themselves. Each
+message is a MESSAGE_HEADER (type, unix timestamp, payload length)
+followed by a JPEG (MSG_FRAME) or a JSON list of detections
+(MSG_DETECTIONS). Slow subscribers only ever get the newest frame, so
+they cannot stall the worker.
+"""
+import json
+import os
+import socket
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+MSG_FRAME = 1
+MSG_DETECTIONS = 2
+
+MESSAGE_HEADER = struct.Struct('<BdI')  # message type, timestamp, payload length
+
+
+def _to_builtin(value):
+    # NumPy scalars from OpenCV (box coordinates, confidences)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _Subscriber:
+    """Per-connection sender holding the newest frame and recent detections"""
+
+    def __init__(self, conn, on_close):
+        self.conn = conn
+        self.on_close = on_close
+        self.condition = threading.Condition()
+        self.frame = None
+        self.detections = deque(maxlen=100)
+        self.closed = False
+        threading.Thread(target=self._send_loop, daemon=True).start()
+
+    def offer_frame(self, message):
+        with self.condition:
+            self.frame = message  # Replaces any frame not yet sent
+            self.condition.notify()
+
+    def offer_detections(self, message):
+        with self.condition:
+            self.detections.append(message)
+            self.condition.notify()
+
+    def _send_loop(self):
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.frame is not None or self.detections or self.closed)
+                    if self.closed:
+                        return
+                    messages = list(self.detections)
+                    self.detections.clear()
+                    if self.frame is not None:
+                        messages.append(self.frame)
+                        self.frame = None
+                self.conn.sendall(b''.join(messages))
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+        self.conn.close()
+        self.on_close(self)
+
+
+class FramePublisher:
+    """Unix-socket publisher for frames and detections"""
+
+    def __init__(self, path):
+        self.path = path
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)  # Stale socket from a previous run
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(path)
+        self.sock.listen()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    @property
+    def has_subscribers(self):
+        return bool(self.subscribers)
+
+    def publish_frame(self, jpeg, timestamp):
+        self._publish(MESSAGE_HEADER.pack(MSG_FRAME, timestamp, len(jpeg)) + jpeg, 'offer_frame')
+
+    def publish_detections(self, detections, timestamp):
+        payload = json.dumps(detections, default=_to_builtin).encode('utf-8')
+        self._publish(MESSAGE_HEADER.pack(MSG_DETECTIONS, timestamp, len(payload)) + payload, 'offer_detections')
+
+    def _publish(self, message, method):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            getattr(subscriber, method)(message)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # Publisher closed
+            with self.lock:
+                self.subscribers.add(_Subscriber(conn, self._remove))
+
+    def _remove(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def close(self):
+        self.sock.close()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class FrameSubscriber:
+    """Connect to a FramePublisher and read its messages"""
+
+    def __init__(self, path, timeout=10.0):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+
+    def messages(self):
+        """Yield (message type, timestamp, payload) until the publisher goes away"""
+        stream = self.sock.makefile('rb')
+        try:
+            while True:
+                header = stream.read(MESSAGE_HEADER.size)
+                if len(header) < MESSAGE_HEADER.size:
+                    return
+                msg_type, timestamp, length = MESSAGE_HEADER.unpack(header)
+                payload = stream.read(length)
+                if len(payload) < length:
+                    return
+                if msg_type == MSG_DETECTIONS:
+                    payload = json.loads(payload)
+                yield msg_type, timestamp, payload
+        except OSError:
+            return
+        finally:
+            stream.close()
+            self.close()
+
+    def frames(self):
+        """Yield JPEG bytes of published frames"""
+        for msg_type, _, payload in self.messages():
+            if msg_type == MSG_FRAME:
+                yield payload
+
+    def close(self):
+        self.sock.close()
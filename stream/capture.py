@@ -0,0 +1,129 @@
+import threading
+import time
+
+import cv2
+
+
+class CaptureReader:
+    """Capture thread that keeps only the newest frame from a source
+
+    The thread reads continuously so the driver buffer never fills with
+    stale frames; consumers pull the latest frame with its timestamp and
+    sequence number. Lost devices are reopened with exponential backoff.
+    While throttle() is set (e.g. the motion gate is idle) the thread waits
+    between reads, lowering the capture rate instead of decoding frames
+    nobody will analyze.
+    """
+
+    def __init__(self, source=0, width=640, height=480, fps=30, reconnect_min=0.5, reconnect_max=10.0):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None
+        self.seq = 0
+        self.connected = False
+        self.running = False
+        self.thread = None
+        self.throttle_interval = 0.0
+
+        # Counters
+        self.frames_read = 0
+        self.reconnects = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+
+    def throttle(self, interval):
+        """Wait interval seconds between reads; 0 restores the full frame rate"""
+        with self.condition:
+            if interval != self.throttle_interval:
+                self.throttle_interval = interval
+                self.condition.notify_all()
+
+    def read(self, after_seq=0, timeout=1.0):
+        """Return (frame, timestamp, seq) for the newest frame after after_seq
+
+        Blocks up to timeout seconds for a new frame; returns
+        (None, None, after_seq) if none arrived.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.seq > after_seq or not self.running, timeout):
+                return None, None, after_seq
+            if self.seq <= after_seq:
+                return None, None, after_seq
+            return self.frame, self.timestamp, self.seq
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        cap.set(cv2.CAP_PROP_FPS, self.fps)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        backoff = self.reconnect_min
+        cap = None
+        while self.running:
+            if cap is None:
+                cap = self._open()
+                if cap is None:
+                    print(f"Camera {self.source} unavailable, retrying in {backoff:.1f}s")
+                    backoff = self._wait(backoff)
+                    continue
+                self.connected = True
+
+            ret, frame = cap.read()
+            if not ret:
+                # Sources that open but yield nothing (dead stream, EOF) back off too
+                print(f"Lost camera {self.source}, reconnecting in {backoff:.1f}s")
+                cap.release()
+                cap = None
+                self.connected = False
+                self.reconnects += 1
+                backoff = self._wait(backoff)
+                continue
+            backoff = self.reconnect_min
+
+            with self.condition:
+                self.frame = frame
+                self.timestamp = time.time()
+                self.seq += 1
+                self.frames_read += 1
+                self.condition.notify_all()
+                if self.throttle_interval:
+                    # Woken early when the throttle is lifted or the reader stops
+                    interval = self.throttle_interval
+                    self.condition.wait_for(
+                        lambda: not self.running or self.throttle_interval != interval, interval)
+
+        if cap is not None:
+            cap.release()
+        self.connected = False
+
+    def _wait(self, backoff):
+        """Sleep for backoff seconds (cut short by stop()) and return the next backoff"""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.running, backoff)
+        return min(backoff * 2, self.reconnect_max)
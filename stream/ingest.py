@@ -0,0 +1,625 @@
+"""Compact binary ingest protocol for edge detectors
+
+A connection carries a stream of frames, each a FRAME_HEADER (message type,
+payload length) followed by the payload:
+
+* MSG_INTERN binds a connection-local integer ref to a person or camera id
+  string, so ids cross the wire once per connection.
+* MSG_DETECTIONS carries a batch of fixed-size DETECTION_RECORDs holding
+  interned refs, the emotion's index in EmotionDetection.EMOTION_CHOICES,
+  a float32 confidence and a float64 unix timestamp.
+* MSG_ACK flows back from the server once a MSG_DETECTIONS frame has been
+  committed (or failed), naming the frame by its per-connection sequence
+  number so clients only drop a batch after it is stored.
+"""
+import math
+import os
+import queue
+import select
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from functools import partial
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Person, EmotionDetection, EmotionStats
+
+EMOTION_NAMES = [choice for choice, _ in EmotionDetection.EMOTION_CHOICES]
+EMOTION_CODES = {name: code for code, name in enumerate(EMOTION_NAMES)}
+
+MSG_INTERN = 1
+MSG_DETECTIONS = 2
+MSG_ACK = 3
+
+KIND_PERSON = 0
+KIND_CAMERA = 1
+
+FRAME_HEADER = struct.Struct('<BI')         # message type, payload length
+INTERN_HEADER = struct.Struct('<BI')        # id kind, ref (followed by utf-8 id)
+BATCH_HEADER = struct.Struct('<I')          # record count
+DETECTION_RECORD = struct.Struct('<IIBfd')  # person ref, camera ref, emotion code, confidence, timestamp
+ACK_RECORD = struct.Struct('<QB')           # detections frame seq, stored (1) or failed (0)
+
+MAX_PAYLOAD = 16 * 1024 * 1024
+
+# Field limits enforced by EmotionDetectionCreateSerializer and the models
+PERSON_ID_MAX_LENGTH = Person._meta.get_field('person_id').max_length
+CAMERA_ID_MAX_LENGTH = EmotionDetection._meta.get_field('camera_id').max_length
+MAX_TIMESTAMP = 32503680000.0  # Year 3000
+
+
+class ProtocolError(ValueError):
+    """Raised when a peer sends a malformed frame"""
+
+
+def is_valid_detection(person_id, emotion, confidence, camera_id, timestamp):
+    """Check a detection tuple against the same limits as the HTTP API"""
+    return (
+        0 < len(person_id) <= PERSON_ID_MAX_LENGTH
+        and 0 < len(camera_id) <= CAMERA_ID_MAX_LENGTH
+        and emotion in EMOTION_CODES
+        and math.isfinite(confidence) and 0 <= confidence <= 1
+        and math.isfinite(timestamp) and 0 <= timestamp < MAX_TIMESTAMP
+    )
+
+
+def parse_address(address):
+    """Parse 'tcp://host:port' or 'unix:///path' into (family, sockaddr)"""
+    if address.startswith('unix://'):
+        return socket.AF_UNIX, address[len('unix://'):]
+    if address.startswith('tcp://'):
+        host, _, port = address[len('tcp://'):].rpartition(':')
+        return socket.AF_INET, (host or '0.0.0.0', int(port))
+    raise ValueError(f"Unsupported ingest address: {address}")
+
+
+def encode_frame(msg_type, payload):
+    return FRAME_HEADER.pack(msg_type, len(payload)) + payload
+
+
+class DetectionEncoder:
+    """Encode detections into frames, interning ids per connection"""
+
+    def __init__(self):
+        self.refs = {KIND_PERSON: {}, KIND_CAMERA: {}}
+
+    def reset(self):
+        """Forget interned ids (call when starting a new connection)"""
+        self.refs = {KIND_PERSON: {}, KIND_CAMERA: {}}
+
+    def _intern(self, kind, value, out):
+        refs = self.refs[kind]
+        ref = refs.get(value)
+        if ref is None:
+            ref = refs[value] = len(refs)
+            out.append(encode_frame(MSG_INTERN, INTERN_HEADER.pack(kind, ref) + value.encode('utf-8')))
+        return ref
+
+    def encode(self, detections):
+        """Encode (person_id, emotion, confidence, camera_id, timestamp) tuples"""
+        out = []
+        records = []
+        for person_id, emotion, confidence, camera_id, timestamp in detections:
+            records.append(DETECTION_RECORD.pack(
+                self._intern(KIND_PERSON, str(person_id), out),
+                self._intern(KIND_CAMERA, str(camera_id), out),
+                EMOTION_CODES[emotion],
+                confidence,
+                timestamp,
+            ))
+        out.append(encode_frame(MSG_DETECTIONS, BATCH_HEADER.pack(len(records)) + b''.join(records)))
+        return b''.join(out)
+
+
+class FrameDecoder:
+    """Incrementally decode a byte stream back into detection tuples
+
+    Records that fail is_valid_detection are dropped and counted in
+    rejected; the rest of their batch is kept.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.ids = {KIND_PERSON: {}, KIND_CAMERA: {}}
+        self.rejected = 0
+
+    def feed(self, data):
+        """Consume bytes and return the detections from all complete frames"""
+        return [detection for batch in self.feed_batches(data) for detection in batch]
+
+    def feed_batches(self, data):
+        """Consume bytes and return one detection list per complete MSG_DETECTIONS frame"""
+        self.buffer += data
+        batches = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            msg_type, length = FRAME_HEADER.unpack_from(self.buffer, offset)
+            if length > MAX_PAYLOAD:
+                raise ProtocolError(f"Frame too large: {length} bytes")
+            end = offset + FRAME_HEADER.size + length
+            if end > len(self.buffer):
+                break
+            payload = bytes(self.buffer[offset + FRAME_HEADER.size:end])
+            offset = end
+            if msg_type == MSG_DETECTIONS:
+                batches.append(self.decode_frame(msg_type, payload))
+            else:
+                self.decode_frame(msg_type, payload)
+        del self.buffer[:offset]
+        return batches
+
+    def decode_frame(self, msg_type, payload):
+        """Decode one frame payload; any malformed content raises ProtocolError"""
+        try:
+            return self._decode_frame(msg_type, payload)
+        except (struct.error, UnicodeDecodeError, KeyError, IndexError) as e:
+            raise ProtocolError(f"Malformed frame (type {msg_type}): {e}")
+
+    def _decode_frame(self, msg_type, payload):
+        if msg_type == MSG_INTERN:
+            kind, ref = INTERN_HEADER.unpack_from(payload)
+            if kind not in self.ids:
+                raise ProtocolError(f"Unknown id kind: {kind}")
+            self.ids[kind][ref] = bytes(payload[INTERN_HEADER.size:]).decode('utf-8')
+            return []
+
+        if msg_type == MSG_DETECTIONS:
+            (count,) = BATCH_HEADER.unpack_from(payload)
+            if len(payload) != BATCH_HEADER.size + count * DETECTION_RECORD.size:
+                raise ProtocolError("Detection batch length mismatch")
+            persons = self.ids[KIND_PERSON]
+            cameras = self.ids[KIND_CAMERA]
+            detections = []
+            for person_ref, camera_ref, code, confidence, timestamp in DETECTION_RECORD.iter_unpack(
+                    payload[BATCH_HEADER.size:]):
+                if code >= len(EMOTION_NAMES):
+                    raise ProtocolError(f"Unknown emotion code: {code}")
+                detection = (persons[person_ref], EMOTION_NAMES[code], confidence, cameras[camera_ref], timestamp)
+                if is_valid_detection(*detection):
+                    detections.append(detection)
+                else:
+                    self.rejected += 1
+            return detections
+
+        raise ProtocolError(f"Unknown message type: {msg_type}")
+
+
+class IngestClient:
+    """Persistent connection that batches detections to an IngestServer
+
+    send() only queues under a lock; a background thread owns the socket and
+    does all network I/O with timeouts, reconnecting with exponential
+    backoff, so an unreachable server never blocks the caller. Sent batches
+    stay in flight until the server acks them; nacked batches and those in
+    flight when the connection drops are queued again (at-least-once).
+    """
+
+    def __init__(self, address, batch_size=256, flush_interval=0.05, max_buffer=100000,
+                 timeout=5.0, ack_timeout=30.0, max_inflight=16,
+                 reconnect_min=0.5, reconnect_max=30.0, start=True):
+        self.address = address
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+        self.ack_timeout = ack_timeout
+        self.max_inflight = max_inflight
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.sock = None
+        self.encoder = DetectionEncoder()
+        self.next_seq = 0
+        self.inflight = {}
+        self.ack_buffer = bytearray()
+        self.pending = []
+        self.lock = threading.Lock()     # Guards pending
+        self.io_lock = threading.Lock()  # Guards the socket, encoder and in-flight batches
+        self.wake = threading.Event()
+        self.running = True
+        self.retry_delay = reconnect_min
+        self.next_attempt = 0.0
+        self.flush_thread = None
+        if start:
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+
+    def send(self, person_id, emotion, confidence, camera_id='camera_1', timestamp=None):
+        """Queue a detection; it is sent with the next batch"""
+        if emotion not in EMOTION_CODES:
+            raise ValueError(f"Unknown emotion: {emotion}")
+        with self.lock:
+            self.pending.append((person_id, emotion, confidence, camera_id, timestamp or time.time()))
+            self._trim_locked()
+            if len(self.pending) >= self.batch_size:
+                self.wake.set()
+
+    def _trim_locked(self):
+        if len(self.pending) > self.max_buffer:
+            dropped = len(self.pending) - self.max_buffer
+            del self.pending[:dropped]
+            print(f"Ingest buffer full, dropped {dropped} detections")
+
+    def flush(self):
+        """Collect acks and send queued batches; returns False if the connection failed"""
+        with self.io_lock:
+            try:
+                self._requeue_failed(self._read_acks())
+                if self.sock is None and self.pending:
+                    self._connect()  # Before taking a batch, so a failed connect loses nothing
+                while len(self.inflight) < self.max_inflight:
+                    with self.lock:
+                        batch = self.pending[:self.batch_size]
+                        del self.pending[:len(batch)]
+                    if not batch:
+                        break
+                    self._send_locked(batch)
+                return True
+            except OSError as e:
+                self._disconnect()
+                self._backoff(e)
+                return False
+
+    def send_batch(self, detections):
+        """Send detection tuples and wait until the server has stored them
+
+        Raises OSError if the batch could not be sent, was rejected or was
+        not acknowledged within ack_timeout.
+        """
+        batch = list(detections)
+        with self.io_lock:
+            try:
+                seq = self._send_locked(batch)
+                deadline = time.monotonic() + self.ack_timeout
+                while seq in self.inflight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No ack from ingest server within {self.ack_timeout}s")
+                    acked = self._read_acks(remaining)
+                    if any(acked_seq == seq and not ok for acked_seq, _, ok in acked):
+                        raise OSError("Ingest server failed to store the batch")
+                    self._requeue_failed([ack for ack in acked if ack[0] != seq])
+            except OSError:
+                self._disconnect(drop=batch)
+                raise
+
+    def _send_locked(self, batch):
+        if self.sock is None:
+            self._connect()
+        seq = self.next_seq
+        self.next_seq += 1
+        self.inflight[seq] = batch
+        self.sock.sendall(self.encoder.encode(batch))
+        return seq
+
+    def _read_acks(self, timeout=0.0):
+        """Read whatever acks have arrived; returns (seq, batch, ok) per acked batch"""
+        acked = []
+        while self.sock is not None and self.inflight:
+            readable, _, _ = select.select([self.sock], [], [], timeout)
+            if not readable:
+                break
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Ingest server closed the connection")
+            self.ack_buffer += data
+            frame_size = FRAME_HEADER.size + ACK_RECORD.size
+            while len(self.ack_buffer) >= frame_size:
+                msg_type, length = FRAME_HEADER.unpack_from(self.ack_buffer)
+                if msg_type != MSG_ACK or length != ACK_RECORD.size:
+                    raise ConnectionError(f"Unexpected message from ingest server (type {msg_type})")
+                seq, ok = ACK_RECORD.unpack_from(self.ack_buffer, FRAME_HEADER.size)
+                del self.ack_buffer[:frame_size]
+                if seq in self.inflight:
+                    acked.append((seq, self.inflight.pop(seq), bool(ok)))
+            timeout = 0.0
+        return acked
+
+    def _requeue_failed(self, acked):
+        for _, batch, ok in acked:
+            if not ok:
+                print(f"Ingest server failed to store {len(batch)} detections, retrying")
+                self._requeue(batch)
+
+    def _requeue(self, batch):
+        with self.lock:
+            self.pending[:0] = batch
+            self._trim_locked()
+
+    def _backoff(self, error):
+        print(f"Error sending ingest batch: {str(error)}; retrying in {self.retry_delay:.1f}s")
+        self.next_attempt = time.monotonic() + self.retry_delay
+        self.retry_delay = min(self.retry_delay * 2, self.reconnect_max)
+
+    def _flush_loop(self):
+        while self.running:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            if time.monotonic() < self.next_attempt:
+                continue
+            if self.flush():
+                self.retry_delay = self.reconnect_min
+
+    def _connect(self):
+        family, sockaddr = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(sockaddr)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.encoder.reset()
+        self.next_seq = 0
+
+    def _disconnect(self, drop=None):
+        """Close the connection, queueing unacknowledged batches (except drop) again"""
+        unacked = [batch for _, batch in sorted(self.inflight.items()) if batch is not drop]
+        self.inflight.clear()
+        self.ack_buffer.clear()
+        if unacked:
+            self._requeue([detection for batch in unacked for detection in batch])
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+    def close(self, timeout=None):
+        """Stop the flush thread and try to deliver what is queued before disconnecting
+
+        Waits up to timeout (default ack_timeout) seconds for queued and
+        in-flight batches to be acked; anything left is reported as lost.
+        """
+        self.running = False
+        self.wake.set()
+        if self.flush_thread is not None:
+            self.flush_thread.join(self.timeout)
+        deadline = time.monotonic() + (self.ack_timeout if timeout is None else timeout)
+        while (self.pending or self.inflight) and time.monotonic() < deadline and self.flush():
+            with self.io_lock:
+                try:
+                    self._requeue_failed(self._read_acks(min(0.1, max(0.0, deadline - time.monotonic()))))
+                except OSError:
+                    self._disconnect()
+                    break
+        with self.io_lock:
+            self._disconnect()
+        if self.pending:
+            print(f"Ingest client closed with {len(self.pending)} undelivered detections")
+
+
+class DetectionBatchWriter:
+    """Write detection tuples to the database with bulk queries
+
+    Mirrors EmotionDetectionCreateSerializer.create (person get-or-create,
+    total_detections and EmotionStats counters) for a whole batch at once.
+    """
+
+    def write(self, detections):
+        detections = [(str(d[0]), d[1], d[2], str(d[3]), d[4]) for d in detections]
+        valid = [d for d in detections if is_valid_detection(*d)]
+        if len(valid) != len(detections):
+            print(f"Rejected {len(detections) - len(valid)} invalid detections")
+        detections = valid
+        if not detections:
+            return 0
+
+        person_ids = {d[0] for d in detections}
+        with transaction.atomic():
+            person_pks = dict(Person.objects.filter(person_id__in=person_ids).values_list('person_id', 'id'))
+            missing = person_ids - person_pks.keys()
+            if missing:
+                Person.objects.bulk_create(
+                    [Person(person_id=p, name=f'Person {p}') for p in missing],
+                    ignore_conflicts=True
+                )
+                person_pks.update(Person.objects.filter(person_id__in=missing).values_list('person_id', 'id'))
+
+            EmotionDetection.objects.bulk_create([
+                EmotionDetection(
+                    person_id=person_pks[person_id],
+                    emotion=emotion,
+                    confidence=confidence,
+                    camera_id=camera_id,
+                    detected_at=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc),
+                )
+                for person_id, emotion, confidence, camera_id, timestamp in detections
+            ])
+
+            # Update person and emotion counters
+            per_person = defaultdict(Counter)
+            for person_id, emotion, _, _, _ in detections:
+                per_person[person_pks[person_id]][emotion] += 1
+
+            now = timezone.now()
+            existing_stats = set(EmotionStats.objects.filter(
+                person_id__in=per_person.keys()
+            ).values_list('person_id', flat=True))
+            EmotionStats.objects.bulk_create(
+                [EmotionStats(person_id=pk) for pk in per_person.keys() - existing_stats],
+                ignore_conflicts=True
+            )
+            for pk, counts in per_person.items():
+                Person.objects.filter(pk=pk).update(
+                    total_detections=F('total_detections') + sum(counts.values()),
+                    last_seen=now
+                )
+                EmotionStats.objects.filter(person_id=pk).update(**{
+                    f'{emotion}_count': F(f'{emotion}_count') + count
+                    for emotion, count in counts.items()
+                })
+        return len(detections)
+
+
+class BufferedDetectionWriter:
+    """Queue detections and write them from one background thread in batches
+
+    Has the same send() interface as IngestClient, so in-process pipelines
+    can write to the database directly without a socket hop. extend() takes
+    an optional callback that is called with True once its detections are
+    committed, or False if writing them failed.
+    """
+
+    def __init__(self, batch_size=5000, flush_interval=0.2, writer=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer or DetectionBatchWriter()
+        self.queue = queue.Queue()
+        self.running = True
+        self.written = 0
+        self.thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.thread.start()
+
+    def send(self, person_id, emotion, confidence, camera_id='camera_1', timestamp=None):
+        self.queue.put(([(person_id, emotion, confidence, camera_id, timestamp or time.time())], None))
+
+    def extend(self, detections, callback=None):
+        self.queue.put((detections, callback))
+
+    def close(self):
+        """Stop the writer thread after flushing everything queued"""
+        self.running = False
+        self.thread.join()
+
+    def _write_loop(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while self.running or not self.queue.empty() or batch:
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if batch and (sum(len(detections) for detections, _ in batch) >= self.batch_size or time.monotonic() >= deadline or not self.running):
+                self._write(batch)
+                batch = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, items):
+        """Write queued items in one transaction, falling back to one per item"""
+        close_old_connections()
+        try:
+            self.written += self.writer.write([d for detections, _ in items for d in detections])
+        except Exception as e:
+            if len(items) == 1:
+                print(f"Error writing ingest batch: {str(e)}")
+                self._notify(items[0][1], False)
+                return
+            print(f"Error writing ingest batch, retrying item by item: {str(e)}")
+        else:
+            for _, callback in items:
+                self._notify(callback, True)
+            return
+
+        for detections, callback in items:
+            close_old_connections()
+            try:
+                self.written += self.writer.write(detections)
+            except Exception as e:
+                print(f"Error writing {len(detections)} detections: {str(e)}")
+                self._notify(callback, False)
+            else:
+                self._notify(callback, True)
+
+    @staticmethod
+    def _notify(callback, ok):
+        if callback is not None:
+            try:
+                callback(ok)
+            except Exception as e:
+                print(f"Error in ingest write callback: {str(e)}")
+
+
+class IngestServer:
+    """Accept ingest connections and write decoded detections in batches
+
+    Connection handlers only decode; a single BufferedDetectionWriter
+    thread drains their output so database writes stay batched and
+    serialized, and acks each MSG_DETECTIONS frame once it is committed.
+    """
+
+    def __init__(self, address, batch_size=5000, flush_interval=0.2, writer=None, timeout=5.0):
+        self.address = address
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writer = writer or DetectionBatchWriter()
+        self.buffer = None
+        self.received = 0
+
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                decoder = FrameDecoder()
+                send_lock = threading.Lock()
+                seq = 0  # MSG_DETECTIONS frames received on this connection
+                # Bounds ack sends to a client that stopped reading
+                self.request.settimeout(server.timeout)
+
+                def ack(frame_seq, ok):
+                    with send_lock:
+                        try:
+                            self.request.sendall(encode_frame(MSG_ACK, ACK_RECORD.pack(frame_seq, ok)))
+                        except OSError:
+                            pass  # Client gone; it re-sends unacked batches
+
+                while True:
+                    try:
+                        data = self.request.recv(65536)
+                    except socket.timeout:
+                        continue
+                    except OSError:
+                        break
+                    if not data:
+                        break
+                    try:
+                        batches = decoder.feed_batches(data)
+                    except ProtocolError as e:
+                        print(f"Closing ingest connection: {str(e)}")
+                        break
+                    for detections in batches:
+                        callback = partial(ack, seq)
+                        seq += 1
+                        if detections:
+                            server.received += len(detections)
+                            server.buffer.extend(detections, callback)
+                        else:
+                            callback(True)  # Nothing valid left to store
+
+        family, sockaddr = parse_address(address)
+        if family == socket.AF_UNIX:
+            self.server = socketserver.ThreadingUnixStreamServer(sockaddr, Handler, bind_and_activate=False)
+        else:
+            self.server = socketserver.ThreadingTCPServer(sockaddr, Handler, bind_and_activate=False)
+            self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+
+    @property
+    def written(self):
+        return self.buffer.written if self.buffer is not None else 0
+
+    def serve_forever(self):
+        family, sockaddr = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.unlink(sockaddr)  # Stale socket from a previous run
+        self.server.server_bind()
+        self.server.server_activate()
+        self.buffer = BufferedDetectionWriter(self.batch_size, self.flush_interval, self.writer)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.buffer.close()
+
+    def stop(self):
+        """Stop serving (call from another thread); pending batches are flushed"""
+        self.server.shutdown()
@@ -0,0 +1,59 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from stream.models import Person, EmotionDetection
+from stream.renderers import fast_renderer_classes
+from stream.serializers import EmotionDetectionSerializer, serialize_detection_rows
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rows/sec for detection list serialization (ModelSerializer vs fast path)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000, help='Detections per run')
+        parser.add_argument('--persons', type=int, default=50, help='Distinct persons in the data set')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement (best is reported)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        # Build the data set in memory so only serialization is measured
+        now = timezone.now()
+        persons = [Person(person_id=f'person_{i}') for i in range(1, options['persons'] + 1)]
+        emotions = [choice for choice, _ in EmotionDetection.EMOTION_CHOICES]
+        instances = []
+        value_rows = []
+        for i in range(rows):
+            person = persons[i % len(persons)]
+            detected_at = now - timedelta(milliseconds=i)
+            emotion = emotions[i % len(emotions)]
+            confidence = 0.6 + (i % 35) / 100
+            instances.append(EmotionDetection(
+                id=i + 1, person=person, emotion=emotion,
+                confidence=confidence, detected_at=detected_at, camera_id='camera_1'
+            ))
+            value_rows.append((i + 1, person.person_id, emotion, confidence, detected_at, 'camera_1'))
+
+        fast_renderer = fast_renderer_classes()[0]()
+        measurements = [
+            ('ModelSerializer', lambda: EmotionDetectionSerializer(instances, many=True).data),
+            ('serialize_detection_rows', lambda: serialize_detection_rows(value_rows)),
+            ('ModelSerializer + JSONRenderer', lambda: JSONRenderer().render(
+                EmotionDetectionSerializer(instances, many=True).data)),
+            (f'fast path + {type(fast_renderer).__name__}', lambda: fast_renderer.render(
+                serialize_detection_rows(value_rows))),
+        ]
+
+        for label, func in measurements:
+            best = min(self._time(func) for _ in range(repeat))
+            self.stdout.write(f'{label:<40} {rows / best:>12,.0f} rows/sec ({best * 1000:.1f} ms)')
+
+    def _time(self, func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stream.ingest import DetectionBatchWriter, IngestClient
+from stream.spool import SpoolForwarder
+
+
+class Command(BaseCommand):
+    help = 'Replay spooled detections into the database or an ingest server and compact the spool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=getattr(settings, 'EMOTION_SPOOL_DIR', None),
+            help='Spool directory (defaults to EMOTION_SPOOL_DIR)'
+        )
+        parser.add_argument(
+            '--target',
+            default='orm',
+            help="'orm' to write directly to the database, or an ingest address like 'tcp://host:9100'"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Max detections per sink call')
+        parser.add_argument('--once', action='store_true', help='Forward what is spooled now and exit')
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError('No spool directory: pass --dir or set EMOTION_SPOOL_DIR')
+
+        if options['target'] == 'orm':
+            sink = DetectionBatchWriter().write
+        else:
+            sink = IngestClient(options['target'], start=False).send_batch
+
+        forwarder = SpoolForwarder(str(options['dir']), sink, batch_size=options['batch_size'])
+        if options['once']:
+            forwarded = forwarder.run_once()
+            self.stdout.write(f"Forwarded {forwarded} detections")
+            return
+
+        self.stdout.write(f"Forwarding spool {options['dir']} to {options['target']}")
+        try:
+            forwarder.run_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Forwarded {forwarder.forwarded} detections")
@@ -0,0 +1,106 @@
+import os
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stream.broker import FramePublisher
+from stream.ingest import BufferedDetectionWriter
+from stream.registry import registry
+
+
+class Command(BaseCommand):
+    help = 'Run the capture -> detect -> ingest pipeline as a standalone camera worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--camera',
+            default=getattr(settings, 'CAMERA_INDEX', 0),
+            help='Camera index or video source URL'
+        )
+        parser.add_argument(
+            '--socket',
+            default=getattr(settings, 'CAMERA_WORKER_SOCKET', None),
+            help='Unix socket to publish frames and detections on (defaults to CAMERA_WORKER_SOCKET)'
+        )
+        parser.add_argument(
+            '--cpus',
+            help='Comma-separated CPU ids to pin this process to, e.g. 2,3'
+        )
+        parser.add_argument(
+            '--use-settings-sink',
+            action='store_true',
+            help='Send detections through the spool, ingest server or HTTP API configured in settings; '
+                 'by default they are written to the database from this process and those settings are ignored'
+        )
+        parser.add_argument('--stats-interval', type=float, default=60.0, help='Seconds between stats lines')
+
+    def handle(self, *args, **options):
+        if options['cpus']:
+            if not hasattr(os, 'sched_setaffinity'):
+                raise CommandError('CPU pinning is not supported on this platform')
+            os.sched_setaffinity(0, {int(cpu) for cpu in options['cpus'].split(',')})
+
+        camera = options['camera']
+        if isinstance(camera, str) and camera.isdigit():
+            camera = int(camera)
+
+        # Load models up front so the first frames are not delayed
+        registry.warm_up(['face_cascade'], background=False)
+        from stream.utils import CameraStreamer
+
+        sink = None if options['use_settings_sink'] else BufferedDetectionWriter(batch_size=500, flush_interval=0.5)
+        streamer = CameraStreamer(camera_index=camera, detection_sink=sink)
+        publisher = FramePublisher(options['socket']) if options['socket'] else None
+
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        self.stdout.write(f"Camera worker started (pid {os.getpid()}, camera {camera}, socket {options['socket']})")
+        processed = 0
+        last_stats = time.monotonic()
+        was_watching = False
+        try:
+            while not stop.is_set():
+                result = streamer.analyze_frame()
+                if result is None:
+                    continue
+                frame, timestamp, detections = result
+                processed += 1
+
+                if publisher is not None and detections:
+                    publisher.publish_detections(detections, timestamp)
+
+                # Only annotate and encode when someone is watching or recording
+                watching = publisher is not None and publisher.has_subscribers
+                if watching and not was_watching:
+                    # The cached JPEG may predate the unwatched stretch; render afresh for the new viewer
+                    streamer.last_jpeg = None
+                was_watching = watching
+                if watching or streamer.clip_recorder is not None:
+                    jpeg = streamer.render_frame(frame, timestamp, detections)
+                    if watching:
+                        publisher.publish_frame(jpeg, timestamp)
+
+                if time.monotonic() - last_stats >= options['stats_interval']:
+                    self._log_stats(streamer, processed, time.monotonic() - last_stats, sink)
+                    processed = 0
+                    last_stats = time.monotonic()
+        finally:
+            self.stdout.write('Stopping camera worker')
+            streamer.release_camera()
+            if publisher is not None:
+                publisher.close()
+            if sink is not None:
+                sink.close()
+
+    def _log_stats(self, streamer, processed, elapsed, sink):
+        line = f"{processed / elapsed:.1f} frames/sec"
+        if streamer.motion_gate is not None:
+            line += f", motion gate {streamer.motion_gate.stats()}"
+        if sink is not None:
+            line += f", {sink.written} detections written"
+        self.stdout.write(line)
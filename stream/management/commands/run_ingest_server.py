@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stream.ingest import IngestServer
+
+
+class Command(BaseCommand):
+    help = 'Accept binary detection streams from edge detectors and write them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            default=getattr(settings, 'EMOTION_INGEST_ADDRESS', None) or 'tcp://0.0.0.0:9100',
+            help="Listen address, 'tcp://host:port' or 'unix:///path/to.sock'"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Max detections per database write')
+        parser.add_argument('--flush-interval', type=float, default=0.2, help='Max seconds to hold a partial batch')
+
+    def handle(self, *args, **options):
+        server = IngestServer(
+            options['address'],
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval']
+        )
+        self.stdout.write(f"Ingest server listening on {options['address']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Received {server.received} detections, wrote {server.written}")
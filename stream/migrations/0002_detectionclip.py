@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stream', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionClip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigger', models.CharField(choices=[('new_person', 'New person'), ('emotion_change', 'Emotion change')], max_length=20)),
+                ('emotion', models.CharField(choices=[('happy', 'Happy'), ('sad', 'Sad'), ('angry', 'Angry'), ('surprised', 'Surprised'), ('fear', 'Fear'), ('disgust', 'Disgust'), ('neutral', 'Neutral')], max_length=20)),
+                ('camera_id', models.CharField(default='camera_1', max_length=50)),
+                ('file_path', models.CharField(max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('ended_at', models.DateTimeField()),
+                ('detection', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clips', to='stream.emotiondetection')),
+                ('person', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clips', to='stream.person')),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
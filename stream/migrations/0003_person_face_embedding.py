@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stream', '0002_detectionclip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='person',
+            name='face_embedding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -7,6 +7,7 @@ class Person(models.Model):
     first_detected = models.DateTimeField(default=timezone.now)
     last_seen = models.DateTimeField(auto_now=True)
     total_detections = models.IntegerField(default=0)
+    face_embedding = models.BinaryField(blank=True, null=True)
     
     def __str__(self):
         return f"Person {self.person_id}"
@@ -37,6 +38,43 @@ class EmotionDetection(models.Model):
     class Meta:
         ordering = ['-detected_at']
 
+class DetectionClip(models.Model):
+    TRIGGER_CHOICES = [
+        ('new_person', 'New person'),
+        ('emotion_change', 'Emotion change'),
+    ]
+    
+    person = models.ForeignKey(Person, on_delete=models.SET_NULL, null=True, blank=True, related_name='clips')
+    detection = models.ForeignKey(EmotionDetection, on_delete=models.SET_NULL, null=True, blank=True, related_name='clips')
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    emotion = models.CharField(max_length=20, choices=EmotionDetection.EMOTION_CHOICES)
+    camera_id = models.CharField(max_length=50, default='camera_1')
+    file_path = models.CharField(max_length=255)
+    started_at = models.DateTimeField()
+    ended_at = models.DateTimeField()
+    
+    def link_detection(self, person_id, since):
+        """Attach the first matching detection from since to ended_at; returns True once linked"""
+        detection = EmotionDetection.objects.filter(
+            person__person_id=person_id,
+            camera_id=self.camera_id,
+            emotion=self.emotion,
+            detected_at__gte=since,
+            detected_at__lte=self.ended_at,
+        ).select_related('person').order_by('detected_at').first()
+        if detection is None:
+            return False
+        self.detection = detection
+        self.person = detection.person
+        self.save(update_fields=['detection', 'person'])
+        return True
+    
+    def __str__(self):
+        return f"Clip {self.file_path} ({self.trigger})"
+    
+    class Meta:
+        ordering = ['-started_at']
+
 class EmotionStats(models.Model):
     person = models.OneToOneField(Person, on_delete=models.CASCADE, related_name='stats')
     happy_count = models.IntegerField(default=0)
@@ -0,0 +1,75 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Cheap frame-differencing gate ahead of face detection
+
+    Frames are downscaled to a small blurred grayscale image and compared
+    against a running-average background. Detection runs only when enough
+    pixels changed, while faces are still being tracked within
+    tracking_grace_seconds of the last motion, or every keyframe_seconds so
+    people standing still are not missed. The grace window keeps a static
+    false positive (a face on a poster) from forcing detection forever.
+    """
+
+    def __init__(self, threshold=0.002, pixel_threshold=25, width=160, learning_rate=0.05,
+                 keyframe_seconds=5.0, idle_fps=5, tracking_grace_seconds=2.0):
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.width = width
+        self.learning_rate = learning_rate
+        self.keyframe_seconds = keyframe_seconds
+        self.tracking_grace_seconds = tracking_grace_seconds
+        self.idle_interval = 1.0 / idle_fps if idle_fps else 0.0
+        self.background = None
+        self.last_processed_at = 0.0
+        self.last_motion_at = 0.0
+        self.idle = False
+
+        # Counters
+        self.frames_seen = 0
+        self.frames_skipped = 0
+
+    def motion_ratio(self, frame):
+        """Fraction of pixels that changed against the background model"""
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self.background is None:
+            self.background = gray.astype(np.float32)
+            return 1.0
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        return cv2.countNonZero(mask) / mask.size
+
+    def should_process(self, frame, tracking=False):
+        """Return True if the frame should go through face/emotion detection"""
+        self.frames_seen += 1
+        now = time.monotonic()
+        moving = self.motion_ratio(frame) >= self.threshold
+        if moving:
+            self.last_motion_at = now
+        process = (
+            moving
+            or (tracking and now - self.last_motion_at < self.tracking_grace_seconds)
+            or now - self.last_processed_at >= self.keyframe_seconds
+        )
+        self.idle = not process
+        if process:
+            self.last_processed_at = now
+        else:
+            self.frames_skipped += 1
+        return process
+
+    def stats(self):
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_skipped': self.frames_skipped,
+            'skip_ratio': self.frames_skipped / self.frames_seen if self.frames_seen else 0.0,
+        }
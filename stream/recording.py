@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import cv2
+import numpy as np
+from django.db import close_old_connections
+
+from .models import Person, DetectionClip
+
+_STOP = object()  # Write queue sentinel
+
+
+class ClipRecorder:
+    """Record clips around detection events from already-encoded JPEG frames
+
+    The live path only appends JPEG bytes to a bounded ring (no extra
+    encoding or I/O). When a trigger fires, the ring is snapshotted as
+    pre-roll, frames keep being collected for the post-roll, and the clip
+    is handed to a background thread that decodes and writes it with
+    cv2.VideoWriter and records a DetectionClip row. Detections may reach
+    the database after the clip (spool, batched ingest), so unlinked clips
+    are retried every link_retry_interval seconds for up to link_timeout.
+    """
+
+    def __init__(self, directory, camera_id='camera_1', fps=30, pre_roll_seconds=5,
+                 post_roll_seconds=5, trigger_emotions=('angry', 'fear'), trigger_new_person=True,
+                 max_pending_clips=4, link_retry_interval=5.0, link_timeout=300.0):
+        self.directory = directory
+        self.camera_id = camera_id
+        self.pre_roll_seconds = pre_roll_seconds
+        self.post_roll_seconds = post_roll_seconds
+        self.trigger_emotions = set(trigger_emotions)
+        self.trigger_new_person = trigger_new_person
+        self.link_retry_interval = link_retry_interval
+        self.link_timeout = link_timeout
+        os.makedirs(directory, exist_ok=True)
+
+        # Ring of (timestamp, jpeg bytes), capped in frames as well as seconds
+        self.ring = deque(maxlen=max(1, int(fps * pre_roll_seconds)))
+        self.active_clips = []
+        self.write_queue = queue.Queue(maxsize=max_pending_clips)
+        self.unlinked = []  # (DetectionClip, person_id, since, give up at)
+        self.writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer_thread.start()
+
+    def add_frame(self, jpeg, timestamp=None):
+        """Add an encoded frame to the pre-roll ring and any recording clips"""
+        timestamp = timestamp or time.time()
+        self.ring.append((timestamp, jpeg))
+        while self.ring and self.ring[0][0] < timestamp - self.pre_roll_seconds:
+            self.ring.popleft()
+
+        for clip in list(self.active_clips):
+            clip['frames'].append((timestamp, jpeg))
+            if timestamp >= clip['until']:
+                self.active_clips.remove(clip)
+                try:
+                    self.write_queue.put_nowait(clip)
+                except queue.Full:
+                    print(f"Clip writer busy, dropped clip for {clip['person_id']}")
+
+    def handle_detections(self, detections, timestamp=None):
+        """Start clips for detections that match the configured triggers"""
+        for detection in detections:
+            if detection['is_new_person'] and self.trigger_new_person:
+                self.trigger(detection['person_id'], detection['emotion'], 'new_person', timestamp)
+            elif detection['emotion_changed'] and detection['emotion'] in self.trigger_emotions:
+                self.trigger(detection['person_id'], detection['emotion'], 'emotion_change', timestamp)
+
+    def trigger(self, person_id, emotion, reason, timestamp=None):
+        """Start a clip; ignored while one is already recording for the person"""
+        timestamp = timestamp or time.time()
+        if any(clip['person_id'] == person_id for clip in self.active_clips):
+            return
+        self.active_clips.append({
+            'person_id': person_id,
+            'emotion': emotion,
+            'trigger': reason,
+            'triggered_at': timestamp,
+            'until': timestamp + self.post_roll_seconds,
+            'frames': list(self.ring),
+        })
+
+    def close(self):
+        """Write clips still recording with the frames collected so far, then stop the writer"""
+        active_clips, self.active_clips = self.active_clips, []
+        for clip in active_clips:
+            self.write_queue.put(clip)
+        self.write_queue.put(_STOP)
+        self.writer_thread.join()
+
+    def _write_loop(self):
+        while True:
+            try:
+                clip = self.write_queue.get(timeout=self.link_retry_interval)
+            except queue.Empty:
+                clip = None
+            try:
+                if clip is not None and clip is not _STOP:
+                    self._write_clip(clip)
+                if self.unlinked:
+                    self._link_pending()
+            except Exception as e:
+                print(f"Error writing clip: {str(e)}")
+            if clip is _STOP:
+                if self.unlinked:
+                    print(f"Stopped with {len(self.unlinked)} clips not linked to a detection")
+                return
+
+    def _link_pending(self):
+        close_old_connections()
+        now = time.monotonic()
+        still_unlinked = []
+        for record in self.unlinked:
+            clip, person_id, since, give_up_at = record
+            if clip.link_detection(person_id, since):
+                continue
+            if now < give_up_at:
+                still_unlinked.append(record)
+            else:
+                print(f"No detection found for clip {clip.file_path}")
+        self.unlinked = still_unlinked
+
+    def _write_clip(self, clip):
+        frames = clip['frames']
+        if not frames:
+            return
+
+        started_at = datetime.fromtimestamp(frames[0][0], tz=dt_timezone.utc)
+        ended_at = datetime.fromtimestamp(frames[-1][0], tz=dt_timezone.utc)
+        duration = (ended_at - started_at).total_seconds()
+        fps = (len(frames) - 1) / duration if duration > 0 else 1.0
+
+        file_name = f"{clip['person_id']}_{started_at.strftime('%Y%m%d_%H%M%S')}_{clip['trigger']}.mp4"
+        file_path = os.path.join(self.directory, file_name)
+        writer = None
+        try:
+            for _, jpeg in frames:
+                frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(file_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+                writer.write(frame)
+        finally:
+            if writer is not None:
+                writer.release()
+        if writer is None:
+            return
+
+        # Link the clip to the detection that triggered it, now or once it is ingested
+        close_old_connections()
+        since = datetime.fromtimestamp(clip['triggered_at'], tz=dt_timezone.utc) - timedelta(seconds=2)
+        record = DetectionClip.objects.create(
+            person=Person.objects.filter(person_id=clip['person_id']).first(),
+            trigger=clip['trigger'],
+            emotion=clip['emotion'],
+            camera_id=self.camera_id,
+            file_path=file_path,
+            started_at=started_at,
+            ended_at=ended_at,
+        )
+        if not record.link_detection(clip['person_id'], since):
+            self.unlinked.append((record, clip['person_id'], since, time.monotonic() + self.link_timeout))
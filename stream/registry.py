@@ -0,0 +1,91 @@
+"""Lazy registry for computer-vision models and optional heavy modules
+
+Nothing heavy is imported when this module loads. Each entry is loaded on
+first use via get(), or ahead of time by warm_up() on a background thread,
+and its load time is recorded so startup cost is visible. OpenCV itself is
+a plain module-level import of the stream modules that use it; views.py
+defers importing those so API-only workers never load it.
+"""
+import importlib
+import threading
+import time
+
+from django.conf import settings
+
+
+class ModelRegistry:
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.timings = {}
+        self.lock = threading.Lock()
+        self.load_locks = {}
+
+    def register(self, name, loader):
+        """Register a zero-argument callable that loads a model"""
+        with self.lock:
+            self.loaders[name] = loader
+            self.load_locks[name] = threading.Lock()
+
+    def is_loaded(self, name):
+        return name in self.models
+
+    def get(self, name):
+        """Return a model, loading it on first use (thread-safe, loads once)"""
+        try:
+            return self.models[name]
+        except KeyError:
+            pass
+
+        with self.load_locks[name]:
+            if name not in self.models:
+                start = time.perf_counter()
+                model = self.loaders[name]()
+                self.timings[name] = time.perf_counter() - start
+                self.models[name] = model
+                print(f"Loaded {name} in {self.timings[name] * 1000:.1f} ms")
+        return self.models[name]
+
+    def warm_up(self, names=None, background=True):
+        """Load models ahead of first use, by default on a daemon thread"""
+        names = list(names if names is not None else self.loaders)
+
+        def load_all():
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"Warm-up failed for {name}: {str(e)}")
+            print(f"Model warm-up finished in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """Load times in milliseconds for every loaded model"""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+
+
+registry = ModelRegistry()
+
+
+def _load_face_cascade():
+    import cv2
+    return cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+
+registry.register('face_cascade', _load_face_cascade)
+registry.register('face_recognition', lambda: importlib.import_module('face_recognition'))
+
+
+def warm_up_from_settings():
+    """Start a background warm-up of MODEL_WARMUP entries, if any"""
+    names = getattr(settings, 'MODEL_WARMUP', [])
+    if names:
+        return registry.warm_up(names)
+    return None
@@ -0,0 +1,153 @@
+import os
+import re
+import threading
+
+import cv2
+import numpy as np
+
+from .models import Person
+from .registry import registry
+
+PERSON_ID_PATTERN = re.compile(r'^person_(\d+)$')
+
+
+class EmbeddingIndex:
+    """Flat in-memory index of face embeddings keyed by person_id
+
+    Vectors live in one preallocated float32 matrix with cached squared
+    norms, so a batch of queries is a single matrix product.
+    """
+
+    def __init__(self, dim=128, capacity=1024):
+        self.dim = dim
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.norms = np.empty(capacity, dtype=np.float32)
+        self.person_ids = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.person_ids)
+
+    def add(self, person_id, embedding):
+        with self.lock:
+            size = len(self.person_ids)
+            if size == len(self.vectors):
+                self.vectors = np.concatenate([self.vectors, np.empty_like(self.vectors)])
+                self.norms = np.concatenate([self.norms, np.empty_like(self.norms)])
+            vector = np.asarray(embedding, dtype=np.float32)
+            self.vectors[size] = vector
+            self.norms[size] = vector @ vector
+            self.person_ids.append(person_id)
+
+    def search(self, embeddings):
+        """Nearest person for each query; returns (person_ids, euclidean distances)"""
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        with self.lock:
+            size = len(self.person_ids)
+            if size == 0 or len(queries) == 0:
+                return [None] * len(queries), np.full(len(queries), np.inf, dtype=np.float32)
+            distances = (
+                np.einsum('ij,ij->i', queries, queries)[:, None]
+                + self.norms[None, :size]
+                - 2 * queries @ self.vectors[:size].T
+            )
+            best = distances.argmin(axis=1)
+            best_distances = np.sqrt(np.maximum(distances[np.arange(len(queries)), best], 0))
+            return [self.person_ids[i] for i in best], best_distances
+
+    def save(self, path):
+        with self.lock:
+            size = len(self.person_ids)
+            np.savez(path, vectors=self.vectors[:size], person_ids=np.array(self.person_ids))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            vectors = data['vectors']
+            index = cls(dim=vectors.shape[1], capacity=max(1024, len(vectors)))
+            for person_id, vector in zip(data['person_ids'].tolist(), vectors):
+                index.add(person_id, vector)
+        return index
+
+    @classmethod
+    def from_database(cls, dim=128):
+        index = cls(dim=dim)
+        rows = Person.objects.exclude(face_embedding=None).values_list('person_id', 'face_embedding')
+        for person_id, embedding in rows.iterator():
+            index.add(person_id, np.frombuffer(embedding, dtype=np.float32))
+        return index
+
+
+class FaceReidentifier:
+    """Match new tracks to known persons by face embedding
+
+    Uses face_recognition (dlib) 128-d encodings. On startup the index is
+    loaded from the snapshot file when it matches the enrolled persons in
+    the database, and rebuilt from Person.face_embedding otherwise.
+    """
+
+    def __init__(self, snapshot_path=None, threshold=0.6, snapshot_every=50):
+        self.face_recognition = registry.get('face_recognition')  # Optional dependency
+        self.snapshot_path = snapshot_path
+        self.threshold = threshold
+        self.snapshot_every = snapshot_every
+        self.enrolled_since_snapshot = 0
+        self.index = self._load_index()
+
+    def _load_index(self):
+        enrolled = set(Person.objects.exclude(face_embedding=None).values_list('person_id', flat=True))
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            try:
+                index = EmbeddingIndex.load(self.snapshot_path)
+                if len(index) == len(enrolled) and set(index.person_ids) == enrolled:
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring face index snapshot: {str(e)}")
+        index = EmbeddingIndex.from_database()
+        if self.snapshot_path:
+            index.save(self.snapshot_path)
+        return index
+
+    def next_person_number(self):
+        """First person_<n> number not used by an existing Person"""
+        numbers = [
+            int(match.group(1))
+            for match in map(PERSON_ID_PATTERN.match,
+                             Person.objects.filter(person_id__startswith='person_').values_list('person_id', flat=True))
+            if match
+        ]
+        return max(numbers, default=0) + 1
+
+    def resolve(self, frame, boxes, provisional_ids):
+        """Return a person_id per (x, y, w, h) box in one batched lookup
+
+        Faces close enough to an enrolled embedding reuse that person_id;
+        the rest are enrolled under their provisional id.
+        """
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  # Contiguous copy; dlib rejects strided views
+        locations = [(y, x + w, y + h, x) for (x, y, w, h) in boxes]
+        embeddings = self.face_recognition.face_encodings(rgb, known_face_locations=locations)
+        matches, distances = self.index.search(embeddings)
+
+        person_ids = []
+        for embedding, match, distance, provisional_id in zip(embeddings, matches, distances, provisional_ids):
+            if match is not None and distance <= self.threshold:
+                person_ids.append(match)
+            else:
+                self.enroll(provisional_id, embedding)
+                person_ids.append(provisional_id)
+        return person_ids
+
+    def enroll(self, person_id, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        self.index.add(person_id, embedding)
+        person, created = Person.objects.get_or_create(
+            person_id=person_id,
+            defaults={'name': f'Person {person_id}'}
+        )
+        Person.objects.filter(pk=person.pk).update(face_embedding=embedding.tobytes())
+
+        self.enrolled_since_snapshot += 1
+        if self.snapshot_path and self.enrolled_since_snapshot >= self.snapshot_every:
+            self.index.save(self.snapshot_path)
+            self.enrolled_since_snapshot = 0
@@ -1,3 +1,4 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Person, EmotionDetection, EmotionStats
 
@@ -8,6 +9,32 @@ class EmotionDetectionSerializer(serializers.ModelSerializer):
         model = EmotionDetection
         fields = ['id', 'person_id', 'emotion', 'confidence', 'detected_at', 'camera_id']
 
+# Columns fetched by the fast path, in the order of EmotionDetectionSerializer fields
+EMOTION_DETECTION_VALUES = ('id', 'person__person_id', 'emotion', 'confidence', 'detected_at', 'camera_id')
+
+def serialize_detection_rows(rows):
+    """Serialize values_list(*EMOTION_DETECTION_VALUES) rows without ModelSerializer overhead
+
+    Output matches EmotionDetectionSerializer, including DRF's ISO 8601
+    rendering of detected_at in the current timezone.
+    """
+    current_tz = timezone.get_current_timezone()
+    data = []
+    append = data.append
+    for pk, person_id, emotion, confidence, detected_at, camera_id in rows:
+        detected_at = detected_at.astimezone(current_tz).isoformat()
+        if detected_at.endswith('+00:00'):
+            detected_at = detected_at[:-6] + 'Z'
+        append({
+            'id': pk,
+            'person_id': person_id,
+            'emotion': emotion,
+            'confidence': confidence,
+            'detected_at': detected_at,
+            'camera_id': camera_id,
+        })
+    return data
+
 class EmotionStatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmotionStats
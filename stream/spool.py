@@ -0,0 +1,275 @@
+"""Durable on-disk spool for detections
+
+The detector appends to the newest segment file in the spool directory
+using the ingest frame encoding (each segment interns its own ids, so it
+can be decoded on its own). A SpoolForwarder replays segments into a sink
+in bulk, records how far it got in a checkpoint file and deletes segments
+once they are sealed and fully acknowledged. Delivery is at-least-once: a
+crash between a sink write and its checkpoint replays that batch.
+
+A failed write keeps its batch pending and moves on to a new segment, so a
+torn frame can only ever be the last one in a segment.
+"""
+import json
+import os
+import threading
+import time
+
+from .ingest import FRAME_HEADER, MSG_DETECTIONS, DetectionEncoder, FrameDecoder, ProtocolError
+
+SEGMENT_SUFFIX = '.seg'
+CHECKPOINT_NAME = 'checkpoint.json'
+
+
+def segment_name(seq):
+    return f'{seq:012d}{SEGMENT_SUFFIX}'
+
+
+def list_segments(directory):
+    """Segment file names in the spool directory, oldest first"""
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def read_checkpoint(directory):
+    """Return (segment name, byte offset) acknowledged so far, or (None, 0)"""
+    try:
+        with open(os.path.join(directory, CHECKPOINT_NAME)) as f:
+            checkpoint = json.load(f)
+        return checkpoint['segment'], checkpoint['offset']
+    except (OSError, ValueError, KeyError):
+        return None, 0
+
+
+def write_checkpoint(directory, segment, offset):
+    path = os.path.join(directory, CHECKPOINT_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'segment': segment, 'offset': offset}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class DetectionSpool:
+    """Append-only segmented log of detections
+
+    append() only buffers in memory so the video loop never waits on disk;
+    a background thread writes and fsyncs pending records every
+    fsync_interval seconds (or sooner once fsync_records are pending).
+    While writes fail, up to max_pending detections are kept in memory.
+    """
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, fsync_interval=0.5, fsync_records=1000,
+                 max_pending=100000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.fsync_records = fsync_records
+        self.max_pending = max_pending
+        os.makedirs(directory, exist_ok=True)
+
+        # Always start a fresh segment: ids interned in older ones are unknown here
+        segments = list_segments(directory)
+        self.seq = int(segments[-1][:-len(SEGMENT_SUFFIX)]) + 1 if segments else 1
+        self.file = None
+        self.encoder = DetectionEncoder()
+        self.pending = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.flush_event = threading.Event()
+        self.appended = 0
+        self.running = True
+        self._open_segment()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def append(self, person_id, emotion, confidence, camera_id='camera_1', timestamp=None):
+        """Queue a detection for the next fsync batch"""
+        with self.lock:
+            self.pending.append((person_id, emotion, confidence, camera_id, timestamp or time.time()))
+            self.appended += 1
+            if len(self.pending) >= self.fsync_records:
+                self.flush_event.set()
+
+    def flush(self):
+        """Write and fsync pending detections, rotating the segment if full"""
+        with self.write_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return
+            try:
+                if self.file is None:
+                    self._open_segment()
+                self.file.write(self.encoder.encode(pending))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError:
+                # Retry the batch later, in a new segment past any torn frame
+                with self.lock:
+                    self.pending[:0] = pending
+                    if len(self.pending) > self.max_pending:
+                        dropped = len(self.pending) - self.max_pending
+                        del self.pending[:dropped]
+                        print(f"Detection spool buffer full, dropped {dropped} detections")
+                self._close_segment()
+                raise
+            if self.file.tell() >= self.segment_bytes:
+                self._close_segment()
+
+    def close(self):
+        """Stop the flush thread, then write and fsync whatever is still pending"""
+        self.running = False
+        self.flush_event.set()
+        self.flush_thread.join()
+        try:
+            self.flush()
+        finally:
+            self._close_segment()
+
+    def _open_segment(self):
+        self.file = open(os.path.join(self.directory, segment_name(self.seq)), 'ab')
+        self.encoder.reset()
+
+    def _close_segment(self):
+        """Seal the current segment; the next flush opens a new one"""
+        if self.file is None:
+            return
+        try:
+            self.file.close()
+        except OSError as e:
+            print(f"Error closing spool segment: {str(e)}")
+        self.file = None
+        self.seq += 1
+
+    def _flush_loop(self):
+        while self.running:
+            self.flush_event.wait(self.fsync_interval)
+            self.flush_event.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing detection spool: {str(e)}")
+
+
+class SpoolForwarder:
+    """Replay spooled detections into a sink and compact acknowledged segments
+
+    sink is called with lists of (person_id, emotion, confidence, camera_id,
+    timestamp) tuples and must raise if the batch was not stored, e.g.
+    DetectionBatchWriter().write or IngestClient.send_batch (which waits for
+    the server's ack). Corrupt frames are logged and skipped.
+    """
+
+    def __init__(self, directory, sink, batch_size=5000, poll_interval=0.5, retry_interval=5.0):
+        self.directory = directory
+        self.sink = sink
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.segment = None
+        self.decoder = None
+        self.offset = 0
+        self.forwarded = 0
+        self.stop_event = threading.Event()
+
+    def run_forever(self):
+        while not self.stop_event.is_set():
+            try:
+                forwarded = self.run_once()
+            except Exception as e:
+                print(f"Error forwarding detection spool: {str(e)}")
+                self.stop_event.wait(self.retry_interval)
+                continue
+            if not forwarded:
+                self.stop_event.wait(self.poll_interval)
+
+    def start(self):
+        thread = threading.Thread(target=self.run_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run_once(self):
+        """Forward everything currently readable; returns detections forwarded"""
+        segments = list_segments(self.directory)
+        if not segments:
+            return 0
+        if self.segment is None or self.segment not in segments:
+            checkpoint_segment, checkpoint_offset = read_checkpoint(self.directory)
+            if checkpoint_segment in segments:
+                self._open(checkpoint_segment, checkpoint_offset)
+            else:
+                self._open(segments[0], 0)
+
+        forwarded = 0
+        while True:
+            # Check for a newer segment *before* reading: if one exists, the
+            # writer has finished with this segment and EOF really is the end
+            sealed = self.segment != list_segments(self.directory)[-1]
+            forwarded += self._forward_segment()
+            if not sealed:
+                return forwarded
+            os.remove(os.path.join(self.directory, self.segment))
+            segments = list_segments(self.directory)
+            if not segments:
+                return forwarded
+            self._open(segments[0], 0)
+            write_checkpoint(self.directory, self.segment, 0)
+
+    def _open(self, segment, offset):
+        """Start reading a segment, re-learning ids interned before offset"""
+        self.segment = segment
+        self.decoder = FrameDecoder()
+        self.offset = 0
+        for end, msg_type, payload in self._read_frames():
+            if end > offset:
+                break
+            if msg_type != MSG_DETECTIONS:
+                try:
+                    self.decoder.decode_frame(msg_type, payload)
+                except ProtocolError as e:
+                    print(f"Skipping corrupt spool frame in {self.segment}: {str(e)}")
+            self.offset = end
+
+    def _read_frames(self):
+        """Yield (end offset, type, payload) for complete frames after self.offset"""
+        base = self.offset
+        with open(os.path.join(self.directory, self.segment), 'rb') as f:
+            f.seek(base)
+            data = f.read()
+        position = 0
+        while len(data) - position >= FRAME_HEADER.size:
+            msg_type, length = FRAME_HEADER.unpack_from(data, position)
+            end = position + FRAME_HEADER.size + length
+            if end > len(data):
+                break  # Partially written frame
+            yield base + end, msg_type, data[position + FRAME_HEADER.size:end]
+            position = end
+
+    def _forward_segment(self):
+        forwarded = 0
+        batch = []
+        batch_end = self.offset
+        for end, msg_type, payload in self._read_frames():
+            try:
+                batch.extend(self.decoder.decode_frame(msg_type, payload))
+            except ProtocolError as e:
+                print(f"Skipping corrupt spool frame in {self.segment}: {str(e)}")
+            batch_end = end
+            if len(batch) >= self.batch_size:
+                forwarded += self._ack(batch, batch_end)
+                batch = []
+        if batch or batch_end != self.offset:
+            forwarded += self._ack(batch, batch_end)
+        return forwarded
+
+    def _ack(self, batch, end):
+        if batch:
+            self.sink(batch)
+        self.offset = end
+        write_checkpoint(self.directory, self.segment, end)
+        self.forwarded += len(batch)
+        return len(batch)
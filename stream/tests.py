@@ -1,3 +1,658 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import cv2
+import numpy as np
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .annotation import FONT, FONT_SCALE, FONT_THICKNESS, FrameAnnotator
+from .broker import MSG_DETECTIONS as BROKER_DETECTIONS, MSG_FRAME, FramePublisher, FrameSubscriber
+from .capture import CaptureReader
+from .ingest import (
+    BATCH_HEADER, DETECTION_RECORD, INTERN_HEADER, KIND_PERSON, MSG_DETECTIONS, MSG_INTERN,
+    DetectionBatchWriter, DetectionEncoder, FrameDecoder, IngestClient, IngestServer, ProtocolError,
+    encode_frame,
+)
+from .models import DetectionClip, EmotionDetection, EmotionStats, Person
+from .motion import MotionGate
+from .recording import ClipRecorder
+from .registry import registry
+from .reid import EmbeddingIndex, FaceReidentifier
+from .renderers import msgpack
+from .serializers import (
+    EMOTION_DETECTION_VALUES, EmotionDetectionCreateSerializer, EmotionDetectionSerializer, serialize_detection_rows,
+)
+from .spool import DetectionSpool, SpoolForwarder, list_segments, read_checkpoint
+
+DETECTIONS = [
+    ('person_1', 'happy', 0.5, 'camera_1', 1700000000.0),
+    ('person_2', 'sad', 0.25, 'camera_1', 1700000001.0),
+    ('person_1', 'neutral', 0.75, 'camera_2', 1700000002.0),
+]
+
+
+class DetectionSerializationTests(TestCase):
+    def setUp(self):
+        person = Person.objects.create(person_id='person_1', name='Person person_1')
+        for detected_at in (
+            datetime(2024, 3, 1, 12, 30, 5, tzinfo=dt_timezone.utc),
+            datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=dt_timezone.utc),
+            datetime(2024, 7, 1, 23, 59, 59, 1, tzinfo=ZoneInfo('America/New_York')),
+        ):
+            detection = EmotionDetection.objects.create(person=person, emotion='happy', confidence=0.5)
+            EmotionDetection.objects.filter(pk=detection.pk).update(detected_at=detected_at)
+
+    def assert_matches_serializer(self):
+        queryset = EmotionDetection.objects.order_by('id')
+        expected = EmotionDetectionSerializer(queryset.select_related('person'), many=True).data
+        self.assertEqual(serialize_detection_rows(queryset.values_list(*EMOTION_DETECTION_VALUES)), expected)
+
+    def test_rows_match_serializer(self):
+        self.assert_matches_serializer()
+
+    def test_rows_match_serializer_in_other_timezones(self):
+        for tz in ('UTC', 'Asia/Kolkata', 'America/New_York'):
+            with self.subTest(tz=tz), timezone.override(ZoneInfo(tz)):
+                self.assert_matches_serializer()
+
+    def test_live_emotions_msgpack(self):
+        if msgpack is None:
+            self.skipTest('msgpack is not installed')
+        EmotionDetection.objects.update(detected_at=timezone.now())
+        response = self.client.get(reverse('live-emotions'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(
+            msgpack.unpackb(response.content),
+            serialize_detection_rows(EmotionDetection.objects.order_by('-detected_at').values_list(
+                *EMOTION_DETECTION_VALUES))
+        )
+
+
+class FrameCodecTests(SimpleTestCase):
+    def test_round_trip(self):
+        data = DetectionEncoder().encode(DETECTIONS)
+        self.assertEqual(FrameDecoder().feed(data), DETECTIONS)
+
+    def test_split_feeds(self):
+        encoder = DetectionEncoder()
+        data = encoder.encode(DETECTIONS[:2]) + encoder.encode(DETECTIONS[2:])
+        decoder = FrameDecoder()
+        decoded = []
+        for i in range(len(data)):
+            decoded += decoder.feed(data[i:i + 1])
+        self.assertEqual(decoded, DETECTIONS)
+        self.assertEqual(decoder.buffer, b'')
+
+    def test_batches_per_frame(self):
+        encoder = DetectionEncoder()
+        data = encoder.encode(DETECTIONS[:1]) + encoder.encode(DETECTIONS[1:])
+        self.assertEqual(FrameDecoder().feed_batches(data), [DETECTIONS[:1], DETECTIONS[1:]])
+
+    def test_malformed_frames(self):
+        frames = [
+            encode_frame(MSG_INTERN, b'\x00'),
+            encode_frame(MSG_INTERN, INTERN_HEADER.pack(KIND_PERSON, 0) + b'\xff\xfe'),
+            encode_frame(MSG_INTERN, INTERN_HEADER.pack(7, 0) + b'id'),
+            encode_frame(MSG_DETECTIONS, b'\x01'),
+            encode_frame(MSG_DETECTIONS, BATCH_HEADER.pack(2) + DETECTION_RECORD.pack(0, 0, 0, 0.5, 1.0)),
+            encode_frame(MSG_DETECTIONS, BATCH_HEADER.pack(1) + DETECTION_RECORD.pack(5, 5, 0, 0.5, 1.0)),
+            encode_frame(9, b''),
+        ]
+        for frame in frames:
+            with self.subTest(frame=frame), self.assertRaises(ProtocolError):
+                FrameDecoder().feed(frame)
+
+    def test_invalid_records_are_rejected(self):
+        valid = ('person_3', 'angry', 1.0, 'camera_1', 1700000003.0)
+        data = DetectionEncoder().encode([
+            ('p' * 101, 'happy', 0.5, 'camera_1', 1700000000.0),
+            ('person_1', 'happy', float('nan'), 'camera_1', 1700000000.0),
+            ('person_1', 'happy', 1.5, 'camera_1', 1700000000.0),
+            ('person_1', 'happy', 0.5, 'c' * 51, 1700000000.0),
+            valid,
+        ])
+        decoder = FrameDecoder()
+        self.assertEqual(decoder.feed(data), [valid])
+        self.assertEqual(decoder.rejected, 4)
+
+
+class DetectionBatchWriterTests(TestCase):
+    def snapshot(self):
+        return (
+            sorted(Person.objects.values_list('person_id', 'total_detections')),
+            sorted(EmotionStats.objects.values_list(
+                'person__person_id', 'happy_count', 'sad_count', 'neutral_count')),
+            sorted(EmotionDetection.objects.values_list('person__person_id', 'emotion', 'camera_id')),
+        )
+
+    def test_matches_serializer(self):
+        for person_id, emotion, confidence, camera_id, _ in DETECTIONS:
+            serializer = EmotionDetectionCreateSerializer(data={
+                'person_id': person_id, 'emotion': emotion, 'confidence': confidence, 'camera_id': camera_id,
+            })
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        expected = self.snapshot()
+
+        Person.objects.all().delete()
+        self.assertEqual(DetectionBatchWriter().write(DETECTIONS), len(DETECTIONS))
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_counters_accumulate(self):
+        writer = DetectionBatchWriter()
+        writer.write(DETECTIONS)
+        writer.write(DETECTIONS[:1])
+        person = Person.objects.get(person_id='person_1')
+        self.assertEqual(person.total_detections, 3)
+        self.assertEqual(person.stats.happy_count, 2)
+
+    def test_invalid_records_do_not_fail_batch(self):
+        written = DetectionBatchWriter().write(DETECTIONS + [('p' * 101, 'happy', 0.5, 'camera_1', 1.0)])
+        self.assertEqual(written, len(DETECTIONS))
+        self.assertEqual(EmotionDetection.objects.count(), len(DETECTIONS))
+
+
+class FakeWriter:
+    def __init__(self):
+        self.written = []
+        self.fail = False
+
+    def write(self, detections):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        self.written.extend(detections)
+        return len(detections)
+
+
+class IngestServerTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.address = f'unix://{os.path.join(self.directory, "ingest.sock")}'
+        self.writer = FakeWriter()
+        self.server = IngestServer(self.address, batch_size=100, flush_interval=0.01, writer=self.writer)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.stop)
+        while self.server.buffer is None:
+            time.sleep(0.01)
+
+    def test_send_batch_waits_for_ack(self):
+        client = IngestClient(self.address, start=False, ack_timeout=5)
+        self.addCleanup(client.close)
+        client.send_batch(DETECTIONS)
+        self.assertEqual(self.writer.written, DETECTIONS)
+
+    def test_failed_write_is_nacked(self):
+        client = IngestClient(self.address, start=False, ack_timeout=5)
+        self.addCleanup(client.close)
+        self.writer.fail = True
+        with self.assertRaises(OSError):
+            client.send_batch(DETECTIONS)
+        self.writer.fail = False
+        client.send_batch(DETECTIONS[:1])
+        self.assertEqual(self.writer.written, DETECTIONS[:1])
+
+    def test_queued_detections_are_flushed(self):
+        client = IngestClient(self.address, batch_size=2, flush_interval=0.01)
+        self.addCleanup(client.close)
+        for person_id, emotion, confidence, camera_id, timestamp in DETECTIONS:
+            client.send(person_id, emotion, confidence, camera_id, timestamp)
+        deadline = time.monotonic() + 5
+        while (client.pending or client.inflight) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.writer.written, DETECTIONS)
+
+    def test_close_delivers_queued_detections(self):
+        client = IngestClient(self.address, batch_size=1000, flush_interval=60)
+        for person_id, emotion, confidence, camera_id, timestamp in DETECTIONS:
+            client.send(person_id, emotion, confidence, camera_id, timestamp)
+        client.close(timeout=5)
+        self.assertEqual(self.writer.written, DETECTIONS)
+        self.assertFalse(client.flush_thread.is_alive())
+
+
+class DetectionSpoolTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def spool(self, **kwargs):
+        return DetectionSpool(self.directory, fsync_interval=3600, **kwargs)
+
+    def append_all(self, spool, detections):
+        for detection in detections:
+            spool.append(*detection)
+
+    def test_rotation_and_compaction(self):
+        spool = self.spool(segment_bytes=1)
+        for detection in DETECTIONS:
+            self.append_all(spool, [detection])
+            spool.flush()
+        spool.close()
+        self.assertEqual(len(list_segments(self.directory)), len(DETECTIONS))
+
+        forwarded = []
+        self.assertEqual(SpoolForwarder(self.directory, forwarded.extend).run_once(), len(DETECTIONS))
+        self.assertEqual(forwarded, DETECTIONS)
+        # Only the newest segment, which may still be written to, is kept
+        self.assertEqual(list_segments(self.directory), [read_checkpoint(self.directory)[0]])
+
+    def test_resume_from_checkpoint(self):
+        spool = self.spool()
+        self.append_all(spool, DETECTIONS[:2])
+        spool.flush()
+
+        def failing_sink(batch):
+            raise OSError('sink unavailable')
+
+        with self.assertRaises(OSError):
+            SpoolForwarder(self.directory, failing_sink).run_once()
+
+        forwarded = []
+        SpoolForwarder(self.directory, forwarded.extend).run_once()
+        self.append_all(spool, DETECTIONS[2:])
+        spool.close()
+        SpoolForwarder(self.directory, forwarded.extend).run_once()
+        self.assertEqual(forwarded, DETECTIONS)
+
+    def test_corrupt_frame_is_skipped(self):
+        spool = self.spool()
+        self.append_all(spool, DETECTIONS[:1])
+        spool.flush()
+        spool.file.write(encode_frame(MSG_INTERN, b'\x00'))
+        self.append_all(spool, DETECTIONS[1:])
+        spool.close()
+
+        forwarded = []
+        SpoolForwarder(self.directory, forwarded.extend).run_once()
+        self.assertEqual(forwarded, DETECTIONS)
+
+    def test_failed_flush_keeps_batch(self):
+        spool = self.spool()
+        self.append_all(spool, DETECTIONS[:1])
+        segment = spool.file
+
+        class TornFile:
+            def write(self, data):
+                segment.write(data[:5])
+                raise OSError('disk full')
+
+            def close(self):
+                segment.close()
+
+        spool.file = TornFile()
+        with self.assertRaises(OSError):
+            spool.flush()
+        self.assertEqual(len(spool.pending), 1)
+
+        self.append_all(spool, DETECTIONS[1:])
+        spool.close()
+        forwarded = []
+        SpoolForwarder(self.directory, forwarded.extend).run_once()
+        self.assertEqual(forwarded, DETECTIONS)
+
+    def test_close_writes_pending_and_stops_flush_thread(self):
+        spool = self.spool()
+        self.append_all(spool, DETECTIONS)
+        spool.close()
+        self.assertFalse(spool.flush_thread.is_alive())
+
+        forwarded = []
+        SpoolForwarder(self.directory, forwarded.extend).run_once()
+        self.assertEqual(forwarded, DETECTIONS)
+
+
+class ClipRecorderTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.jpeg = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))[1].tobytes()
+
+    def test_close_writes_recording_clips(self):
+        recorder = ClipRecorder(self.directory, post_roll_seconds=60)
+        now = time.time()
+        recorder.add_frame(self.jpeg, now)
+        recorder.trigger('person_1', 'angry', 'emotion_change', now)
+        recorder.add_frame(self.jpeg, now + 0.1)
+        recorder.close()
+
+        self.assertFalse(recorder.writer_thread.is_alive())
+        clip = DetectionClip.objects.get()
+        self.assertTrue(os.path.exists(clip.file_path))
+        self.assertIsNone(clip.detection)
+
+    def test_late_detection_is_linked(self):
+        recorder = ClipRecorder(self.directory, post_roll_seconds=0.1, link_retry_interval=0.05)
+        self.addCleanup(recorder.close)
+        now = time.time()
+        recorder.add_frame(self.jpeg, now)
+        recorder.trigger('person_1', 'angry', 'emotion_change', now)
+        recorder.add_frame(self.jpeg, now + 0.2)
+        deadline = time.monotonic() + 5
+        while not recorder.unlinked and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        DetectionBatchWriter().write([('person_1', 'angry', 0.9, 'camera_1', now + 0.1)])
+        while recorder.unlinked and time.monotonic() < deadline:
+            time.sleep(0.01)
+        clip = DetectionClip.objects.get()
+        self.assertEqual(clip.detection, EmotionDetection.objects.get())
+        self.assertEqual(clip.person.person_id, 'person_1')
+
+
+class EmbeddingIndexTests(SimpleTestCase):
+    def test_search_returns_nearest(self):
+        index = EmbeddingIndex(dim=4, capacity=2)
+        index.add('person_1', [1, 0, 0, 0])
+        index.add('person_2', [0, 1, 0, 0])
+        index.add('person_3', [0, 0, 3, 0])  # Grows past the initial capacity
+        self.assertEqual(len(index), 3)
+        self.assertGreaterEqual(len(index.vectors), 3)
+
+        person_ids, distances = index.search([[0.9, 0, 0, 0], [0, 0, 3, 0.5]])
+        self.assertEqual(person_ids, ['person_1', 'person_3'])
+        np.testing.assert_allclose(distances, [0.1, 0.5], atol=1e-5)
+
+    def test_search_empty_index(self):
+        person_ids, distances = EmbeddingIndex(dim=4).search([[1, 0, 0, 0]])
+        self.assertEqual(person_ids, [None])
+        self.assertTrue(np.isinf(distances).all())
+
+    def test_save_load_round_trip(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'index.npz')
+        index = EmbeddingIndex(dim=4)
+        index.add('person_1', [1, 2, 3, 4])
+        index.add('person_2', [4, 3, 2, 1])
+        index.save(path)
+
+        loaded = EmbeddingIndex.load(path)
+        self.assertEqual(loaded.person_ids, ['person_1', 'person_2'])
+        np.testing.assert_array_equal(loaded.vectors[:2], index.vectors[:2])
+        self.assertEqual(loaded.search([[4, 3, 2, 1]])[0], ['person_2'])
+
+
+@mock.patch.dict(registry.models, {'face_recognition': object()})  # dlib is not needed here
+class FaceReidentifierTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.snapshot = os.path.join(directory, 'index.npz')
+
+    def enroll(self, person_id, value):
+        Person.objects.create(
+            person_id=person_id, name=person_id, face_embedding=np.full(128, value, dtype=np.float32).tobytes())
+
+    def save_snapshot(self, person_ids):
+        index = EmbeddingIndex()
+        for person_id in person_ids:
+            index.add(person_id, np.full(128, 9, dtype=np.float32))
+        index.save(self.snapshot)
+
+    def test_snapshot_used_when_ids_match(self):
+        self.enroll('person_1', 1)
+        self.save_snapshot(['person_1'])
+        reidentifier = FaceReidentifier(snapshot_path=self.snapshot)
+        self.assertEqual(reidentifier.index.vectors[0, 0], 9)  # Snapshot vector, not the database one
+
+    def test_snapshot_rebuilt_when_ids_differ(self):
+        self.enroll('person_1', 1)
+        self.save_snapshot(['person_2'])
+        reidentifier = FaceReidentifier(snapshot_path=self.snapshot)
+        self.assertEqual(reidentifier.index.person_ids, ['person_1'])
+        self.assertEqual(reidentifier.index.vectors[0, 0], 1)
+        self.assertEqual(EmbeddingIndex.load(self.snapshot).person_ids, ['person_1'])
+
+    def test_next_person_number(self):
+        reidentifier = FaceReidentifier()
+        self.assertEqual(reidentifier.next_person_number(), 1)
+        for person_id in ('person_2', 'person_10', 'visitor_50', 'person_x'):
+            Person.objects.create(person_id=person_id, name=person_id)
+        self.assertEqual(reidentifier.next_person_number(), 11)
+
+
+class MotionGateTests(SimpleTestCase):
+    def setUp(self):
+        self.frame = np.full((120, 160, 3), 100, dtype=np.uint8)
+        self.moved = self.frame.copy()
+        self.moved[40:80, 40:80] = 255
+
+    def test_static_scene_is_skipped(self):
+        gate = MotionGate(keyframe_seconds=60)
+        self.assertTrue(gate.should_process(self.frame))  # First frame seeds the background
+        self.assertFalse(gate.should_process(self.frame))
+        self.assertTrue(gate.idle)
+        self.assertTrue(gate.should_process(self.moved))
+        self.assertFalse(gate.idle)
+
+    def test_tracking_only_forces_detection_within_grace_window(self):
+        gate = MotionGate(keyframe_seconds=60, tracking_grace_seconds=0.1)
+        gate.should_process(self.frame)
+        self.assertTrue(gate.should_process(self.frame, tracking=True))
+        time.sleep(0.15)
+        # A static false positive no longer keeps detection running
+        self.assertFalse(gate.should_process(self.frame, tracking=True))
+
+    def test_keyframe_cadence(self):
+        gate = MotionGate(keyframe_seconds=0.1)
+        gate.should_process(self.frame)
+        self.assertFalse(gate.should_process(self.frame))
+        time.sleep(0.15)
+        self.assertTrue(gate.should_process(self.frame))
+
+
+class FakeCapture:
+    """Stand-in for cv2.VideoCapture returning numbered frames"""
+
+    def __init__(self, opened=True, frames=None, interval=0.001):
+        self.opened = opened
+        self.frames = frames  # None for an endless source
+        self.interval = interval
+        self.reads = 0
+
+    def isOpened(self):
+        return self.opened
+
+    def set(self, prop, value):
+        return True
+
+    def read(self):
+        time.sleep(self.interval)
+        if self.frames is not None and self.reads >= self.frames:
+            return False, None
+        self.reads += 1
+        return True, np.full((4, 4, 3), self.reads % 256, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+class CaptureReaderTests(SimpleTestCase):
+    def start_reader(self, captures, **kwargs):
+        opened = []
+
+        def video_capture(source):
+            capture = captures(len(opened))
+            opened.append(capture)
+            return capture
+
+        patcher = mock.patch('stream.capture.cv2.VideoCapture', side_effect=video_capture)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        reader = CaptureReader(**kwargs)
+        reader.start()
+        self.addCleanup(reader.stop)
+        return reader, opened
+
+    def test_read_returns_newest_frame(self):
+        reader, opened = self.start_reader(lambda n: FakeCapture())
+        frame, timestamp, seq = reader.read(after_seq=0, timeout=2)
+        self.assertIsNotNone(frame)
+        self.assertGreater(seq, 0)
+
+        time.sleep(0.05)  # Frames keep arriving; read() skips to the newest
+        newer, newer_timestamp, newer_seq = reader.read(after_seq=seq, timeout=2)
+        self.assertGreater(newer_seq, seq + 1)
+        self.assertGreaterEqual(newer_timestamp, timestamp)
+        self.assertEqual(newer[0, 0, 0], newer_seq % 256)  # Frame and seq come from the same read
+
+    def test_read_times_out_without_new_frame(self):
+        reader, opened = self.start_reader(lambda n: FakeCapture(opened=False), reconnect_min=10)
+        started = time.monotonic()
+        self.assertEqual(reader.read(after_seq=0, timeout=0.1), (None, None, 0))
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_source_without_frames_backs_off(self):
+        # Opens fine but never yields a frame, like a dead stream or a file at EOF
+        reader, opened = self.start_reader(lambda n: FakeCapture(frames=0), reconnect_min=0.05, reconnect_max=0.2)
+        time.sleep(0.5)
+        self.assertLessEqual(len(opened), 6)  # 0.05 + 0.1 + 0.2 + 0.2 ... not a hot loop
+        self.assertGreaterEqual(reader.reconnects, 2)
+        self.assertFalse(reader.connected)
+
+    def test_backoff_resets_after_frames_arrive(self):
+        # Every capture yields a few frames and then fails
+        reader, opened = self.start_reader(lambda n: FakeCapture(frames=3), reconnect_min=0.05, reconnect_max=10)
+        time.sleep(0.6)
+        self.assertGreaterEqual(len(opened), 5)  # Backoff stays at reconnect_min instead of doubling
+
+    def test_stop_interrupts_backoff(self):
+        reader, opened = self.start_reader(lambda n: FakeCapture(opened=False), reconnect_min=30)
+        time.sleep(0.05)
+        started = time.monotonic()
+        reader.stop()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(len(opened), 1)
+
+    def test_throttle_lowers_capture_rate(self):
+        reader, opened = self.start_reader(lambda n: FakeCapture())
+        time.sleep(0.1)
+        reader.throttle(0.05)
+        time.sleep(0.05)
+        reads = opened[0].reads
+        time.sleep(0.3)
+        self.assertLessEqual(opened[0].reads - reads, 8)
+
+        reader.throttle(0.0)
+        reads = opened[0].reads
+        time.sleep(0.1)
+        self.assertGreater(opened[0].reads - reads, 20)
+
+
+class FrameAnnotatorTests(SimpleTestCase):
+    def draw_directly(self, frame, detections):
+        """Reference output: the rectangle/putText calls the annotator replaces"""
+        frame = frame.copy()
+        for detection in detections:
+            x, y, w, h = detection['box']
+            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
+            cv2.putText(frame, detection['person_id'], (x, y-10), FONT, FONT_SCALE, (255, 255, 255), FONT_THICKNESS)
+            cv2.putText(frame, f"{detection['emotion']} ({detection['confidence']:.2f})", (x, y+h+20),
+                        FONT, FONT_SCALE, (0, 255, 0), FONT_THICKNESS)
+        return frame
+
+    def test_matches_direct_drawing(self):
+        rng = np.random.default_rng(0)
+        height, width = 240, 320
+        boxes = {
+            'inside': (100, 80, 60, 60),
+            'top': (100, 2, 60, 60),
+            'bottom': (100, 200, 60, 60),
+            'left': (-5, 80, 60, 60),
+            'right': (290, 80, 60, 60),
+            'top_left_corner': (-20, -20, 40, 40),
+            'bottom_right_corner': (300, 220, 40, 40),
+        }
+        annotator = FrameAnnotator()
+        for name, box in boxes.items():
+            for confidence in (0.0, 0.5, 0.73, 1.0):
+                with self.subTest(box=name, confidence=confidence):
+                    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+                    original = frame.copy()
+                    detections = [{'person_id': 'person_12', 'emotion': 'surprised',
+                                   'confidence': confidence, 'box': box}]
+                    output = annotator.annotate(frame, detections)
+                    np.testing.assert_array_equal(output, self.draw_directly(frame, detections))
+                    np.testing.assert_array_equal(frame, original)  # Input is not modified
+
+    def test_random_boxes_match_direct_drawing(self):
+        rng = np.random.default_rng(1)
+        annotator = FrameAnnotator()
+        for _ in range(100):
+            frame = rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+            detections = [
+                {'person_id': f'person_{rng.integers(1, 10000)}', 'emotion': 'happy',
+                 'confidence': round(float(rng.random()), 2),
+                 'box': tuple(int(v) for v in (rng.integers(-30, 170), rng.integers(-30, 130),
+                                                 rng.integers(5, 80), rng.integers(5, 80)))}
+                for _ in range(rng.integers(1, 4))
+            ]
+            np.testing.assert_array_equal(annotator.annotate(frame, detections), self.draw_directly(frame, detections))
+
+
+class FrameBrokerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.publisher = FramePublisher(os.path.join(directory, 'camera.sock'))
+        self.addCleanup(self.publisher.close)
+
+    def subscribe(self):
+        subscriber = FrameSubscriber(self.publisher.path, timeout=5)
+        self.addCleanup(subscriber.close)
+        deadline = time.monotonic() + 5
+        while not self.publisher.has_subscribers and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return subscriber
+
+    def test_round_trip(self):
+        messages = self.subscribe().messages()
+        self.publisher.publish_detections(
+            [{'person_id': 'person_1', 'confidence': np.float32(0.5), 'box': tuple(np.int32([1, 2, 3, 4]))}], 12.5)
+        self.publisher.publish_frame(b'jpeg bytes', 13.0)
+
+        self.assertEqual(next(messages), (
+            BROKER_DETECTIONS, 12.5, [{'person_id': 'person_1', 'confidence': 0.5, 'box': [1, 2, 3, 4]}]))
+        self.assertEqual(next(messages), (MSG_FRAME, 13.0, b'jpeg bytes'))
+
+    def test_unserializable_detections_raise(self):
+        with self.assertRaises(TypeError):
+            self.publisher.publish_detections([{'box': object()}], 1.0)
+
+    def test_slow_subscriber_gets_newest_frame(self):
+        subscriber = self.subscribe()
+        frame_size = 1024 * 1024  # Far more than the socket buffers, so sends block
+        for i in range(30):
+            self.publisher.publish_frame(bytes([i]) * frame_size, float(i))
+
+        received = []
+        for payload in subscriber.frames():
+            received.append(payload[0])
+            if payload[0] == 29:
+                break
+        self.assertEqual(received[-1], 29)
+        self.assertLess(len(received), 30)  # Frames superseded while the subscriber lagged were dropped
+        self.assertEqual(received, sorted(received))
+
+    def test_subscriber_removed_on_disconnect(self):
+        subscriber = self.subscribe()
+        subscriber.close()
+        self.publisher.publish_frame(b'jpeg', 1.0)
+        deadline = time.monotonic() + 5
+        while self.publisher.has_subscribers and time.monotonic() < deadline:
+            self.publisher.publish_frame(b'jpeg', 1.0)
+            time.sleep(0.01)
+        self.assertFalse(self.publisher.has_subscribers)
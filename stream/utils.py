@@ -1,22 +1,71 @@
 import cv2
 import numpy as np
 import requests
+import time
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.conf import settings
+from .ingest import IngestClient
+from .spool import DetectionSpool
+from .recording import ClipRecorder
+from .reid import FaceReidentifier
+from .motion import MotionGate
+from .capture import CaptureReader
+from .annotation import FrameAnnotator
+from .registry import registry
 
 class EmotionDetector:
-    def __init__(self):
-        # Initialize face detection
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        
+    def __init__(self, detection_sink=None):
         # Emotion labels
         self.emotion_labels = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprised', 'neutral']
         
-        # Person tracking
+        # Person tracking; trackers not matched for tracker_ttl are dropped
         self.person_trackers = {}
         self.next_person_id = 1
+        self.tracker_ttl = timedelta(seconds=getattr(settings, 'TRACKER_TTL_SECONDS', 30))
+        
+        # Detections from the last processed frame and last emotion per person
+        self.last_detections = []
+        self.last_emotions = {}
+        
+        # An explicit in-process sink (e.g. run_camera_worker's batch writer) takes precedence
+        self.detection_sink = detection_sink
+        
+        # Otherwise the binary ingest connection (falls back to the HTTP API)
+        ingest_address = getattr(settings, 'EMOTION_INGEST_ADDRESS', None)
+        self.ingest_client = IngestClient(ingest_address) if ingest_address and detection_sink is None else None
+        
+        # Local spool takes precedence over ingest so outages never cost frames or data
+        spool_dir = getattr(settings, 'EMOTION_SPOOL_DIR', None)
+        self.spool = DetectionSpool(spool_dir) if spool_dir and detection_sink is None else None
+        
+        # Optional face re-identification for stable person IDs across tracks
+        self.reidentifier = None
+        if getattr(settings, 'FACE_REID_ENABLED', False):
+            try:
+                self.reidentifier = FaceReidentifier(
+                    snapshot_path=str(settings.FACE_REID_SNAPSHOT),
+                    threshold=getattr(settings, 'FACE_REID_THRESHOLD', 0.6)
+                )
+                self.next_person_id = self.reidentifier.next_person_number()
+            except ImportError as e:
+                print(f"Face re-identification disabled: {str(e)}")
         
+    def close(self):
+        """Flush and close the spool and ingest connection (not an external detection_sink)"""
+        if self.spool is not None:
+            try:
+                self.spool.close()
+            except OSError as e:
+                print(f"Error closing detection spool: {str(e)}")
+        if self.ingest_client is not None:
+            self.ingest_client.close()
+    
+    @property
+    def face_cascade(self):
+        """Haar cascade, loaded by the model registry on first use"""
+        return registry.get('face_cascade')
+    
     def detect_faces(self, frame):
         """Detect faces in the frame"""
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -34,6 +83,11 @@ class EmotionDetector:
     
     def track_person(self, face_coords, frame_shape):
         """Track person based on face coordinates"""
+        tracker_id = self._match_tracker(face_coords)
+        return self.person_trackers[tracker_id]['person_id']
+    
+    def _match_tracker(self, face_coords):
+        """Return the tracker id for a face, creating a new tracker if needed"""
         x, y, w, h = face_coords
         center_x = x + w // 2
         center_y = y + h // 2
@@ -42,32 +96,72 @@ class EmotionDetector:
         min_distance = float('inf')
         matched_id = None
         
-        for person_id, tracker_data in self.person_trackers.items():
+        for tracker_id, tracker_data in self.person_trackers.items():
             last_center = tracker_data['last_center']
             distance = np.sqrt((center_x - last_center[0])**2 + (center_y - last_center[1])**2)
             
             if distance < 100 and distance < min_distance:  # Threshold for same person
                 min_distance = distance
-                matched_id = person_id
+                matched_id = tracker_id
         
         if matched_id:
             # Update existing tracker
             self.person_trackers[matched_id]['last_center'] = (center_x, center_y)
             self.person_trackers[matched_id]['last_seen'] = datetime.now()
-            return f"person_{matched_id}"
+            return matched_id
         else:
             # Create new tracker
-            person_id = f"person_{self.next_person_id}"
-            self.person_trackers[self.next_person_id] = {
+            tracker_id = self.next_person_id
+            self.person_trackers[tracker_id] = {
+                'person_id': f"person_{tracker_id}",
                 'last_center': (center_x, center_y),
                 'last_seen': datetime.now(),
                 'face_coords': (x, y, w, h)
             }
             self.next_person_id += 1
-            return person_id
+            return tracker_id
+    
+    def expire_trackers(self):
+        """Drop trackers not seen within tracker_ttl and forget their last emotions"""
+        cutoff = datetime.now() - self.tracker_ttl
+        for tracker_id in [tid for tid, tracker in self.person_trackers.items() if tracker['last_seen'] < cutoff]:
+            del self.person_trackers[tracker_id]
+        live_person_ids = {tracker['person_id'] for tracker in self.person_trackers.values()}
+        for person_id in self.last_emotions.keys() - live_person_ids:
+            del self.last_emotions[person_id]
+    
+    def reidentify_trackers(self, frame, tracker_ids):
+        """Resolve new trackers to known persons in one batched lookup
+        
+        On failure the trackers keep their provisional person_<n> ids.
+        """
+        trackers = [self.person_trackers[tracker_id] for tracker_id in tracker_ids]
+        try:
+            person_ids = self.reidentifier.resolve(
+                frame,
+                [tracker['face_coords'] for tracker in trackers],
+                [tracker['person_id'] for tracker in trackers]
+            )
+        except Exception as e:
+            print(f"Error re-identifying faces: {str(e)}")
+            return
+        for tracker, person_id in zip(trackers, person_ids):
+            tracker['person_id'] = person_id
     
     def send_emotion_data(self, person_id, emotion, confidence, camera_id='camera_1'):
         """Send emotion data to Django API"""
+        if self.detection_sink is not None:
+            self.detection_sink.send(person_id, emotion, confidence, camera_id)
+            return
+        
+        if self.spool is not None:
+            self.spool.append(person_id, emotion, confidence, camera_id)
+            return
+        
+        if self.ingest_client is not None:
+            self.ingest_client.send(person_id, emotion, confidence, camera_id)
+            return
+        
         try:
             data = {
                 'person_id': person_id,
@@ -94,14 +188,21 @@ class EmotionDetector:
         """Process a single frame for emotion detection"""
         # Detect faces
         faces = self.detect_faces(frame)
+        self.last_detections = []
+        self.expire_trackers()
+        
+        # Track people first so new tracks can be re-identified in one batch
+        first_new_tracker = self.next_person_id
+        tracker_ids = [self._match_tracker(tuple(face)) for face in faces]
+        if self.reidentifier is not None and self.next_person_id > first_new_tracker:
+            self.reidentify_trackers(frame, range(first_new_tracker, self.next_person_id))
         
         # Process each face
-        for (x, y, w, h) in faces:
+        for (x, y, w, h), tracker_id in zip(faces, tracker_ids):
             # Extract face ROI
             face_roi = frame[y:y+h, x:x+w]
             
-            # Track person
-            person_id = self.track_person((x, y, w, h), frame.shape)
+            person_id = self.person_trackers[tracker_id]['person_id']
             
             # Predict emotion
             emotion, confidence = self.predict_emotion(face_roi)
@@ -109,51 +210,126 @@ class EmotionDetector:
             # Send data to API
             self.send_emotion_data(person_id, emotion, confidence)
             
-            # Draw rectangle and text on frame
-            cv2.rectangle(frame, (x, y), (x+w, y+h), (255, 0, 0), 2)
-            
-            # Add person ID and emotion text
-            cv2.putText(frame, f"{person_id}", (x, y-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(frame, f"{emotion} ({confidence:.2f})", (x, y+h+20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+            previous_emotion = self.last_emotions.get(person_id)
+            self.last_emotions[person_id] = emotion
+            self.last_detections.append({
+                'person_id': person_id,
+                'emotion': emotion,
+                'confidence': confidence,
+                'box': (x, y, w, h),
+                'is_new_person': previous_emotion is None,
+                'emotion_changed': previous_emotion is not None and previous_emotion != emotion,
+            })
         
-        return frame
+        # Drawing is left to FrameAnnotator so the analysis frame stays clean
+        return self.last_detections
 
 class CameraStreamer:
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, detection_sink=None):
         self.camera_index = camera_index
-        self.cap = None
-        self.emotion_detector = EmotionDetector()
+        self.capture = None
+        self.last_seq = 0
+        self.emotion_detector = EmotionDetector(detection_sink=detection_sink)
+        
+        # Event-triggered clip recording
+        self.clip_recorder = None
+        if getattr(settings, 'CLIP_RECORDING_ENABLED', False):
+            self.clip_recorder = ClipRecorder(
+                str(settings.CLIP_DIR),
+                pre_roll_seconds=getattr(settings, 'CLIP_PRE_ROLL_SECONDS', 5),
+                post_roll_seconds=getattr(settings, 'CLIP_POST_ROLL_SECONDS', 5),
+                trigger_emotions=getattr(settings, 'CLIP_TRIGGER_EMOTIONS', ['angry', 'fear']),
+                trigger_new_person=getattr(settings, 'CLIP_TRIGGER_NEW_PERSON', True)
+            )
+        
+        # Overlay drawing for viewers (disable for headless analysis-only cameras)
+        self.annotator = FrameAnnotator() if getattr(settings, 'ANNOTATE_FRAMES', True) else None
+        
+        # Skip detection on static scenes and re-send the cached JPEG
+        self.motion_gate = None
+        self.last_jpeg = None
+        if getattr(settings, 'MOTION_GATE_ENABLED', False):
+            self.motion_gate = MotionGate(
+                threshold=getattr(settings, 'MOTION_THRESHOLD', 0.002),
+                keyframe_seconds=getattr(settings, 'MOTION_KEYFRAME_SECONDS', 5.0),
+                idle_fps=getattr(settings, 'MOTION_IDLE_FPS', 5),
+                tracking_grace_seconds=getattr(settings, 'MOTION_TRACKING_GRACE_SECONDS', 2.0)
+            )
         
     def initialize_camera(self):
         """Initialize camera"""
         try:
-            self.cap = cv2.VideoCapture(self.camera_index)
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            self.cap.set(cv2.CAP_PROP_FPS, 30)
+            self.capture = CaptureReader(self.camera_index, width=640, height=480, fps=30)
+            self.capture.start()
             return True
         except Exception as e:
             print(f"Error initializing camera: {str(e)}")
             return False
     
-    def get_frame(self):
-        """Get a single frame from camera"""
-        if self.cap is None:
+    def analyze_frame(self):
+        """Grab the newest frame and run emotion detection on it
+
+        Returns (frame, timestamp, detections), with detections None when
+        the motion gate skipped the frame, or None if no frame arrived.
+        """
+        if self.capture is None:
             if not self.initialize_camera():
                 return None
         
-        ret, frame = self.cap.read()
-        if not ret:
+        # Always take the newest captured frame; older ones are dropped
+        frame, timestamp, self.last_seq = self.capture.read(after_seq=self.last_seq)
+        if frame is None:
             return None
         
+        # Static scene: skip inference entirely
+        if self.motion_gate is not None:
+            tracking = bool(self.emotion_detector.last_detections)
+            process = self.motion_gate.should_process(frame, tracking=tracking)
+            # Lower the capture rate itself while the scene is static
+            self.capture.throttle(self.motion_gate.idle_interval if self.motion_gate.idle else 0.0)
+            if not process:
+                return frame, timestamp, None
+        
         # Process frame for emotion detection
-        processed_frame = self.emotion_detector.process_frame(frame)
+        detections = self.emotion_detector.process_frame(frame)
+        return frame, timestamp, detections
+    
+    def get_frame(self):
+        """Get a single frame from camera"""
+        result = self.analyze_frame()
+        if result is None:
+            return None
+        return self.render_frame(*result)
+    
+    def render_frame(self, frame, timestamp, detections):
+        """Annotate and JPEG-encode an analyzed frame for viewers and clips"""
+        # Skipped by the motion gate: re-send the cached JPEG
+        if detections is None and self.last_jpeg is not None:
+            if self.clip_recorder is not None:
+                self.clip_recorder.add_frame(self.last_jpeg, timestamp)
+            return self.last_jpeg
+        
+        # A skipped frame with no cached JPEG keeps the last detections' overlays
+        fresh = detections is not None
+        if not fresh:
+            detections = self.emotion_detector.last_detections
+        
+        # Draw overlays on a copy for viewers
+        if self.annotator is not None:
+            frame = self.annotator.annotate(frame, detections)
         
         # Encode frame as JPEG
-        ret, jpeg = cv2.imencode('.jpg', processed_frame)
-        return jpeg.tobytes()
+        ret, jpeg = cv2.imencode('.jpg', frame)
+        jpeg_bytes = jpeg.tobytes()
+        
+        # Reuse the encoded frame for clip pre-roll (no extra encode or I/O)
+        if self.clip_recorder is not None:
+            if fresh:
+                self.clip_recorder.handle_detections(detections, timestamp)
+            self.clip_recorder.add_frame(jpeg_bytes, timestamp)
+        
+        self.last_jpeg = jpeg_bytes
+        return jpeg_bytes
     
     def generate_frames(self):
         """Generator function for streaming frames"""
@@ -162,9 +338,13 @@ class CameraStreamer:
             if frame is not None:
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+            # While the scene is static the throttled capture paces this loop
     
     def release_camera(self):
-        """Release camera resources"""
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
\ No newline at end of file
+        """Release camera resources, flushing pending detections and clips"""
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
+        self.emotion_detector.close()
+        if self.clip_recorder is not None:
+            self.clip_recorder.close()
\ No newline at end of file
@@ -2,9 +2,7 @@ from django.shortcuts import render
 from django.http import StreamingHttpResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-import cv2
 import json
-from .utils import CameraStreamer
 
 # Global camera streamer instance
 camera_streamer = None
@@ -13,6 +11,8 @@ def get_camera_streamer():
     """Get or create camera streamer instance"""
     global camera_streamer
     if camera_streamer is None:
+        # Imported here so API-only workers never load OpenCV
+        from .utils import CameraStreamer
         camera_streamer = CameraStreamer(
             camera_index=getattr(settings, 'CAMERA_INDEX', 0)
         )
@@ -94,8 +94,28 @@ def index(request):
     </html>
     """)
 
+def worker_frames(subscriber):
+    """Relay frames published by run_camera_worker as an MJPEG stream"""
+    for frame in subscriber.frames():
+        yield (b'--frame\r\n'
+               b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n\r\n')
+
 def video_feed(request):
     """Video streaming generator function"""
+    worker_socket = getattr(settings, 'CAMERA_WORKER_SOCKET', None)
+    if worker_socket:
+        # Frames come from the standalone camera worker process
+        from .broker import FrameSubscriber
+        try:
+            subscriber = FrameSubscriber(worker_socket)
+        except OSError as e:
+            print(f"Camera worker not available: {str(e)}")
+            return HttpResponse("Camera not available", status=503)
+        return StreamingHttpResponse(
+            worker_frames(subscriber),
+            content_type='multipart/x-mixed-replace; boundary=frame'
+        )
+    
     try:
         streamer = get_camera_streamer()
         return StreamingHttpResponse(